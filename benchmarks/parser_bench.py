@@ -0,0 +1,208 @@
+"""Офлайн-бенчмарк разбора расписания на записанных страницах
+
+Страницы записываются парсером, если задана переменная окружения
+PARSER_RECORD_DIR, либо генерируются ключом --generate.
+
+Примеры:
+    python -m bot.benchmarks.parser_bench --fixtures fixtures/
+    python -m bot.benchmarks.parser_bench --fixtures fixtures/ --save-baseline baseline.json
+    python -m bot.benchmarks.parser_bench --fixtures fixtures/ --baseline baseline.json --max-regression 0.3
+    python -m bot.benchmarks.parser_bench --fixtures /tmp/fx --generate 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import psutil
+from bot.benchmarks.table_extractor import make_page
+from bot.utils.page_recorder import PageRecorder
+from bot.utils.schedule_hash import content_hash
+from bot.utils.schedule_table import assemble_schedule, collect_schedule_soup, iter_lessons
+
+
+MEMORY_STAGES = ('pipeline', 'legacy_soup')
+MIN_STAGE_DELTA = 0.005  # разница меньше 5 мс - шум, а не регрессия
+
+
+def _timed(func: Callable, repeat: int) -> Tuple[float, Any]:
+    """Медиана времени repeat запусков и результат последнего"""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def _max_rss() -> int:
+    """Пиковый RSS процесса в байтах, включая память C-библиотек (деревья lxml)"""
+    status = Path('/proc/self/status')
+    if status.exists():
+        # Linux: ru_maxrss наследуется через fork/exec от родителя, VmHWM - нет
+        for line in status.read_text().splitlines():
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    try:
+        import resource
+    except ImportError:
+        # Windows: пиковый рабочий набор процесса
+        return psutil.Process().memory_info().peak_wset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _stage_memory(directory: str, stage: str) -> int:
+    """Прирост пикового RSS стадии: выполняется в этом процессе, страницы уже распакованы"""
+    pages = [fixture.read() for fixture in PageRecorder(directory).fixtures()]
+    before = _max_rss()
+    if stage == 'pipeline':
+        replayed = {}
+        for html in pages:
+            assemble_schedule(iter_lessons(html), replayed, set(), set())
+    else:
+        collected = {}
+        for html in pages:
+            collect_schedule_soup(html, collected, set(), set())
+    return _max_rss() - before
+
+
+def measure_memory(directory: str, stage: str) -> Optional[float]:
+    """Прирост пикового RSS стадии в MB, замеренный в отдельном процессе"""
+    result = subprocess.run(
+        [sys.executable, '-m', 'bot.benchmarks.parser_bench', '--fixtures', directory, '--memory-stage', stage],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(f"Не удалось замерить память стадии {stage}: {result.stderr.strip()}", file=sys.stderr)
+        return None
+    return int(result.stdout.strip().splitlines()[-1]) / 1024 / 1024
+
+
+def _assemble(records: List) -> Dict:
+    schedule_data = {}
+    assemble_schedule(records, schedule_data, set(), set())
+    return schedule_data
+
+
+def run_benchmark(recorder: PageRecorder, repeat: int = 7, legacy: bool = True) -> Dict:
+    """Прогон записанных страниц через все стадии разбора"""
+    fixtures = list(recorder.fixtures())
+    if not fixtures:
+        raise SystemExit(f"В каталоге {recorder.directory} нет записанных страниц")
+
+    # tracemalloc не видит память libxml2, поэтому пиковый RSS каждой стадии
+    # замеряется в отдельном процессе (до замеров времени, пока этот процесс мал)
+    directory = str(recorder.directory)
+    memory = {'pipeline': measure_memory(directory, 'pipeline')}
+    if legacy:
+        memory['legacy_soup'] = measure_memory(directory, 'legacy_soup')
+
+    stages = {}
+    stages['decompress'], pages = _timed(lambda: [f.read() for f in fixtures], repeat)
+    stages['extract'], records = _timed(
+        lambda: [record for html in pages for record in iter_lessons(html)], repeat
+    )
+    stages['assemble'], schedule_data = _timed(lambda: _assemble(records), repeat)
+    stages['hash'], _ = _timed(lambda: content_hash(schedule_data), repeat)
+
+    if legacy:
+        stages['legacy_soup'], _ = _timed(
+            lambda: [collect_schedule_soup(html, {}, set(), set()) for html in pages], repeat
+        )
+
+    lessons = sum(len(group) for day in schedule_data.values() for group in day.values())
+    pipeline = stages['decompress'] + stages['extract'] + stages['assemble']
+    return {
+        'pages': len(fixtures),
+        'rows': len(records),
+        'lessons': lessons,
+        'rows_per_sec': len(records) / pipeline if pipeline else 0.0,
+        'peak_memory_mb': memory['pipeline'],
+        'memory_mb': memory,
+        'stages': stages
+    }
+
+
+def check_regression(report: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Сравнение с сохраненным базовым замером"""
+    problems = []
+    if report['rows_per_sec'] < baseline['rows_per_sec'] * (1 - max_regression):
+        problems.append(
+            f"строк/с: {report['rows_per_sec']:,.0f} против {baseline['rows_per_sec']:,.0f}"
+        )
+    if (report['peak_memory_mb'] is not None and baseline.get('peak_memory_mb')
+            and report['peak_memory_mb'] > baseline['peak_memory_mb'] * (1 + max_regression)):
+        problems.append(
+            f"пиковая память: {report['peak_memory_mb']:.1f} MB против {baseline['peak_memory_mb']:.1f} MB"
+        )
+    for stage, seconds in report['stages'].items():
+        if stage == 'legacy_soup':
+            # Прежняя реализация замеряется только для сравнения
+            continue
+        base = baseline.get('stages', {}).get(stage)
+        if base and seconds > base * (1 + max_regression) and seconds - base > MIN_STAGE_DELTA:
+            problems.append(f"стадия {stage}: {seconds * 1000:.1f} ms против {base * 1000:.1f} ms")
+    return problems
+
+
+def print_report(report: Dict):
+    print(f"Страниц: {report['pages']}, строк: {report['rows']}, пар: {report['lessons']}")
+    print(f"Скорость: {report['rows_per_sec']:,.0f} строк/с")
+    print("Прирост пикового RSS:")
+    for stage, megabytes in report['memory_mb'].items():
+        value = f"{megabytes:9.1f} MB" if megabytes is not None else "    не замерен"
+        print(f"  {stage:<12} {value}")
+    print("Стадии:")
+    for stage, seconds in report['stages'].items():
+        print(f"  {stage:<12} {seconds * 1000:9.1f} ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк парсера расписания")
+    parser.add_argument('--fixtures', required=True, help="каталог с записанными страницами")
+    parser.add_argument('--repeat', type=int, default=7, help="число повторов каждой стадии (берется медиана)")
+    parser.add_argument('--no-legacy', action='store_true', help="не замерять прежний разбор через BeautifulSoup")
+    parser.add_argument('--baseline', help="файл базового замера для проверки регрессии")
+    parser.add_argument('--max-regression', type=float, default=0.3, help="допустимое ухудшение (доля)")
+    parser.add_argument('--save-baseline', help="сохранить результат как базовый замер")
+    parser.add_argument('--generate', type=int, metavar='N', help="записать N синтетических страниц и выйти")
+    parser.add_argument('--memory-stage', choices=MEMORY_STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.memory_stage:
+        # Дочерний процесс measure_memory: печатает прирост пикового RSS в байтах
+        print(_stage_memory(args.fixtures, args.memory_stage))
+        return 0
+
+    recorder = PageRecorder(args.fixtures)
+    if args.generate:
+        for seed in range(args.generate):
+            recorder.record(make_page(500, seed), 'synthetic')
+        print(f"Записано страниц: {args.generate}")
+        return 0
+
+    report = run_benchmark(recorder, repeat=args.repeat, legacy=not args.no_legacy)
+    print_report(report)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"Базовый замер сохранен в {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        problems = check_regression(report, baseline, args.max_regression)
+        if problems:
+            print("Регрессия производительности:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print("Регрессий нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
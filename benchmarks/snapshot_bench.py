@@ -0,0 +1,85 @@
+"""Сравнение форматов хранения расписания: вложенный словарь и сжатый снимок
+
+Размер вложенного словаря оценивается по его JSON-представлению.
+
+Примеры:
+    python -m bot.benchmarks.snapshot_bench
+    python -m bot.benchmarks.snapshot_bench --fixtures fixtures/
+    python -m bot.benchmarks.snapshot_bench --pages 20 --repeat 5
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+from bot.benchmarks.parser_bench import _assemble, _timed
+from bot.benchmarks.table_extractor import make_page
+from bot.utils.page_recorder import PageRecorder
+from bot.utils.schedule_snapshot import LazySchedule, encode_snapshot
+from bot.utils.schedule_table import iter_lessons
+
+
+def load_schedule_data(fixtures: str = None, pages: int = 10) -> Dict:
+    """Расписание из записанных страниц или синтетическое"""
+    if fixtures:
+        htmls = [fixture.read() for fixture in PageRecorder(fixtures).fixtures()]
+        if not htmls:
+            raise SystemExit(f"В каталоге {fixtures} нет записанных страниц")
+    else:
+        htmls = [make_page(500, seed) for seed in range(pages)]
+    return _assemble([record for html in htmls for record in iter_lessons(html)])
+
+
+def run_benchmark(schedule_data: Dict, repeat: int = 3, levels: List[int] = (1, 6, 9)) -> Dict:
+    """Размер и время кодирования/распаковки каждого формата"""
+    report = {}
+    encode_time, text = _timed(lambda: json.dumps(schedule_data, ensure_ascii=False), repeat)
+    decode_time, _ = _timed(lambda: json.loads(text), repeat)
+    report['map'] = {
+        'size': len(text.encode('utf-8')),
+        'encode_ms': encode_time * 1000,
+        'decode_ms': decode_time * 1000,
+        'day_ms': decode_time * 1000
+    }
+
+    # Самый загруженный день - худший случай для чтения одного дня
+    busiest = max(schedule_data, key=lambda date: sum(map(len, schedule_data[date].values())), default=None)
+    for level in levels:
+        encode_time, (document, _) = _timed(lambda: encode_snapshot(schedule_data, level), repeat)
+        decode_time, _ = _timed(lambda: LazySchedule(document).to_dict(), repeat)
+        # Чтение одного дня: распаковывается только он
+        day_time, _ = _timed(lambda: LazySchedule(document)[busiest] if busiest else None, repeat)
+        report[f'msgpack+zlib:{level}'] = {
+            'size': document['size'],
+            'encode_ms': encode_time * 1000,
+            'decode_ms': decode_time * 1000,
+            'day_ms': day_time * 1000
+        }
+    return report
+
+
+def print_report(schedule_data: Dict, report: Dict):
+    lessons = sum(len(group) for day in schedule_data.values() for group in day.values())
+    print(f"Дней: {len(schedule_data)}, пар: {lessons}")
+    base = report['map']['size']
+    print(f"{'формат':<16} {'размер':>10} {'сжатие':>7} {'запись':>10} {'чтение':>10} {'один день':>10}")
+    for name, row in report.items():
+        print(
+            f"{name:<16} {row['size'] / 1024:8.1f}КБ {base / row['size']:6.1f}x "
+            f"{row['encode_ms']:8.1f}мс {row['decode_ms']:8.1f}мс {row['day_ms']:8.2f}мс"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Сравнение форматов хранения расписания")
+    parser.add_argument('--fixtures', help="каталог с записанными страницами (по умолчанию - синтетика)")
+    parser.add_argument('--pages', type=int, default=10, help="число синтетических страниц")
+    parser.add_argument('--repeat', type=int, default=3, help="число повторов каждого замера")
+    args = parser.parse_args(argv)
+
+    schedule_data = load_schedule_data(args.fixtures, args.pages)
+    print_report(schedule_data, run_benchmark(schedule_data, repeat=args.repeat))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
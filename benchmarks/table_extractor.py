@@ -0,0 +1,83 @@
+"""Сравнение lxml-экстрактора таблицы с прежним разбором через BeautifulSoup
+
+Запуск: python -m bot.benchmarks.table_extractor [страница.html ...]
+Без аргументов используется синтетическое расписание на несколько страниц.
+"""
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+from bot.utils.schedule_table import collect_schedule, collect_schedule_soup
+
+DISCIPLINES = ['Математика', 'Физика', 'История', 'Английский язык', 'Информатика',
+               'Химия', 'Физкультура', 'Базы данных', 'Программирование', 'Экономика']
+TEACHERS = [f'Преподаватель{i} А.Б.' for i in range(60)]
+GROUPS = [f'{course}{n:02d}' for course in range(1, 5) for n in range(1, 16)]
+DATES = ['22-дек', '23-дек', '24-дек', '25-дек', '26-дек', '27-дек']
+
+
+def make_page(rows_per_page: int, seed: int) -> str:
+    """Синтетическая страница в разметке ARI Data Tables"""
+    rnd = random.Random(seed)
+    header = ''.join(
+        f'<th class="ari-tbl-col-{i}">{name}</th>'
+        for i, name in enumerate(['Дата', 'Группа', 'Пара', 'Дисциплина', 'Преподаватель', 'Кабинет', 'Подгруппа'])
+    )
+    rows = []
+    for _ in range(rows_per_page):
+        cells = [
+            f'({rnd.choice(DATES)})', rnd.choice(GROUPS), str(rnd.randint(1, 7)),
+            rnd.choice(DISCIPLINES), rnd.choice(TEACHERS), str(rnd.randint(100, 420)),
+            rnd.choice(['', '1', '2'])
+        ]
+        rows.append('<tr>' + ''.join(
+            f'<td class="ari-tbl-col-{i}">{value}</td>' for i, value in enumerate(cells)
+        ) + '</tr>')
+    return (
+        '<html><head><title>Расписание</title></head><body><div class="menu">'
+        + '<a href="#">ссылка</a>' * 200
+        + f'</div><table class="ari-tbl"><thead><tr>{header}</tr></thead><tbody>'
+        + ''.join(rows)
+        + '</tbody></table></body></html>'
+    )
+
+
+def run(pages: List[str], repeat: int = 3) -> dict:
+    """Замер обоих вариантов разбора на одном наборе страниц"""
+    results = {}
+    outputs = {}
+    for name, collect in (('soup', collect_schedule_soup), ('lxml', collect_schedule)):
+        best = None
+        for _ in range(repeat):
+            schedule_data, groups, teachers = {}, set(), set()
+            start = time.perf_counter()
+            for html in pages:
+                collect(html, schedule_data, groups, teachers)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        outputs[name] = (schedule_data, groups, teachers)
+        results[name] = best
+
+    rows = sum(len(lessons) for day in outputs['lxml'][0].values() for lessons in day.values())
+    results['rows'] = rows
+    results['identical'] = outputs['soup'] == outputs['lxml']
+    return results
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = [Path(path).read_text(encoding='utf-8') for path in sys.argv[1:]]
+    else:
+        pages = [make_page(500, seed) for seed in range(20)]
+
+    results = run(pages)
+    print(f"Страниц: {len(pages)}, пар: {results['rows']}")
+    for name in ('soup', 'lxml'):
+        print(f"{name:>5}: {results[name] * 1000:8.1f} ms  ({results['rows'] / results[name]:,.0f} строк/с)")
+    print(f"Ускорение: x{results['soup'] / results['lxml']:.1f}")
+    print(f"Результаты совпадают: {'да' if results['identical'] else 'НЕТ'}")
+
+
+if __name__ == '__main__':
+    main()
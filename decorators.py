@@ -1,10 +1,8 @@
 from functools import wraps
 from aiogram.types import Message
-from bot.services.database import Database
+from bot.services.user_store import user_store
 from bot.config import logger
 
-db = Database()
-
 def user_exists_check():
     def decorator(func):
         @wraps(func)
@@ -12,8 +10,9 @@ def user_exists_check():
             user_id = message.from_user.id
             
             try:
-                # Проверяем существование пользователя в БД
-                if not await db.user_exists(user_id):
+                # Профиль уже загружен UserContextMiddleware, если обработчик его принимает
+                user_profile = kwargs.get('user_profile')
+                if user_profile is None and not await user_store.user_exists(user_id):
                     logger.info(f"Пользователь {user_id} не найден в БД")
                     await message.answer(
                         "⚠️ Для использования бота необходимо выполнить команду /start"
@@ -7,9 +7,14 @@ from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBut
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from bot.services.database import Database
+from bot.services.user_store import user_store
 from bot.services.parser import ScheduleParser
-from google.cloud import firestore
+from bot.services.notifications import NotificationManager
+from bot.services.outbox import DEAD, PENDING, SENT, outbox
+from bot.services.scheduler import ScheduleUpdater, get_updater
+from bot.services.storage import SERVER_TIMESTAMP
 from datetime import datetime, timedelta
+import asyncio
 import psutil
 import os
 from bot.utils.validators import InputValidator
@@ -46,16 +51,18 @@ async def admin_stats(callback: CallbackQuery):
         return
 
     try:
-        # Получаем статистику пользователей
-        users = await db.get_all_users()
-        total_users = len(users)
+        # Агрегаты пользователей и кэш читаются параллельно
+        user_stats, groups, teachers_list = await asyncio.gather(
+            db.get_user_stats(), db.get_cached_groups(), db.get_cached_teachers()
+        )
+        total_users = user_stats['total']
         
-        # Считаем пользователей с уведомлениями
-        notif_users = len([u for u in users if u.get('notifications', False)])
+        # Пользователи с уведомлениями
+        notif_users = user_stats['notifications']
 
-        # Считаем пользователей по ролям
-        students = len([u for u in users if u.get('role') == 'student'])
-        teachers = len([u for u in users if u.get('role') == 'teacher'])
+        # Пользователи по ролям
+        students = user_stats['roles'].get('Студент', 0)
+        teachers = user_stats['roles'].get('Преподаватель', 0)
 
         # Время работы бота
         bot_start_time = os.path.getctime(os.path.abspath(__file__))
@@ -65,8 +72,8 @@ async def admin_stats(callback: CallbackQuery):
         uptime_minutes = (uptime.seconds % 3600) // 60
         
         # Кэш
-        cached_groups = len(await db.get_cached_groups())
-        cached_teachers = len(await db.get_cached_teachers())
+        cached_groups = len(groups)
+        cached_teachers = len(teachers_list)
 
         stats_text = (
             "📊 *Детальная статистика бота*\n\n"
@@ -101,22 +108,13 @@ async def admin_users(callback: CallbackQuery):
         return
 
     try:
-        users = await db.get_all_users()
-        
-        # Подсчет статистики по группам
-        group_stats = {}
-        total_students = 0
-        total_teachers = 0
+        user_stats = await db.get_user_stats()
         
-        for user in users:
-            role = user.get('role')
-            if role == 'Студент':
-                total_students += 1
-                group = user.get('selected_group')
-                if group:
-                    group_stats[group] = group_stats.get(group, 0) + 1
-            elif role == 'Преподаватель':
-                total_teachers += 1
+        # Статистика по группам и ролям из агрегатов
+        # Нули скрываются, отрицательные значения видны - это признак расхождения агрегатов
+        group_stats = {group: count for group, count in user_stats['groups'].items() if count != 0}
+        total_students = user_stats['roles'].get('Студент', 0)
+        total_teachers = user_stats['roles'].get('Преподаватель', 0)
 
         # Формируем текст статистики
         users_text = "👥 Статистика пользователей\n\n"
@@ -126,7 +124,7 @@ async def admin_users(callback: CallbackQuery):
             users_text += f"• {group}: {group_stats[group]} чел.\n"
         
         users_text += f"\n📈 Общая статистика:\n"
-        users_text += f"• Всего пользователей: {len(users)}\n"
+        users_text += f"• Всего пользователей: {user_stats['total']}\n"
         users_text += f"• Студентов: {total_students}\n"
         users_text += f"• Преподавателей: {total_teachers}\n"
         users_text += f"• Количество групп: {len(group_stats)}\n"
@@ -147,20 +145,34 @@ async def admin_cache(callback: CallbackQuery):
         return
 
     try:
-        groups = await db.get_cached_groups()
-        teachers = await db.get_cached_teachers()
+        groups, teachers, last_update = await asyncio.gather(
+            db.get_cached_groups(), db.get_cached_teachers(), db.get_last_update_time()
+        )
         
         # Формируем список групп и преподавателей
         groups_list = "\n".join([f"• {group}" for group in sorted(groups)[:5]])
         teachers_list = "\n".join([f"• {teacher}" for teacher in sorted(teachers)[:5]])
         
-        # Получаем время последнего обновления
-        last_update = await db.get_last_update_time()
+        # Статистика кэша документов в памяти
+        cache_stats = db.get_cache_stats()
+        user_stats = user_store.get_stats()
+        snapshot = db.get_snapshot_stats()
+        outbox_stats = outbox.get_stats()
+        snapshot_size = f", {snapshot['size'] / 1024:.1f} КБ" if snapshot.get('size') else ""
         
         cache_text = (
             "💾 *Информация о кэше*\n\n"
             f"📚 Групп в кэше: {len(groups)}\n"
             f"👨‍🏫 Преподавателей в кэше: {len(teachers)}\n\n"
+            f"🧠 Кэш в памяти:\n"
+            f"   • Попаданий: {cache_stats['hits']}\n"
+            f"   • Промахов: {cache_stats['misses']}\n"
+            f"   • Эффективность: {cache_stats['hit_rate']:.1f}%\n"
+            f"   • Сбросов: {cache_stats['invalidations']}\n"
+            f"   • Профилей пользователей: {user_stats['cached']} (ожидают записи: {user_stats['pending']})\n"
+            f"   • Формат расписания: {snapshot['format']}{snapshot_size}\n"
+            f"   • Очередь уведомлений: {outbox_stats[PENDING]} (отправлено: {outbox_stats[SENT]}, "
+            f"отброшено: {outbox_stats[DEAD]})\n\n"
             f"🕒 Последнее обновление: {last_update}"
         )
 
@@ -196,10 +208,11 @@ async def admin_update(callback: CallbackQuery):
             )
             return
 
-        # Обновляем расписание в базе данных
-        await db.update_schedule(schedule_data)
-        # Обновляем время последнего обновления кэша
-        await db.update_cache_time()
+        # Сохраняем расписание и уведомляем подписчиков об изменениях
+        # Тот же экземпляр, что у планировщика: общие лимиты рассылки и очередность записи
+        updater = get_updater() or ScheduleUpdater(NotificationManager(callback.bot))
+        if not await updater.store_schedule(schedule_data):
+            raise RuntimeError("не удалось сохранить расписание")
         
         update_text = (
             "✅ Расписание успешно обновлено!\n\n"
@@ -228,9 +241,8 @@ async def admin_broadcast(callback: CallbackQuery, state: FSMContext):
         await callback.answer("⛔️ У вас нет доступа")
         return
 
-    # Получаем количество пользователей из БД
-    users = await db.get_all_users()
-    user_count = len(users) if users else 0
+    # Количество пользователей из агрегатов
+    user_count = (await db.get_user_stats())['total']
 
     await callback.message.edit_text(
         f"📨 *Отправка сообщения всем пользователям*\n\n"
@@ -248,10 +260,10 @@ async def admin_send_id(callback: CallbackQuery, state: FSMContext):
         await callback.answer("⛔️ У вас нет доступа")
         return
 
-    # Получаем список всех пользователей
-    users = await db.get_all_users()
+    # Проверяем, что в базе есть пользователи
+    user_stats = await db.get_user_stats()
     
-    if not users:
+    if not user_stats['total']:
         await callback.message.edit_text(
             "❌ В базе данных нет пользователей",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
@@ -331,7 +343,7 @@ async def process_schedule_photo(message: Message, state: FSMContext):
         schedule_data = {
             'file_id': file_id,
             'file_path': file_path,
-            'uploaded_at': firestore.SERVER_TIMESTAMP,
+            'uploaded_at': SERVER_TIMESTAMP,
             'uploaded_by': message.from_user.id
         }
 
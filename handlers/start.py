@@ -2,11 +2,10 @@ from aiogram import Router, types
 from aiogram.filters import CommandStart
 from aiogram.types import Message
 from bot.keyboards.keyboards import get_start_keyboard
-from bot.services.database import Database
+from bot.services.user_store import user_store
 from bot.config import logger
 
 router = Router()
-db = Database()
 
 @router.message(CommandStart())
 async def command_start_handler(message: Message) -> None:
@@ -14,9 +13,9 @@ async def command_start_handler(message: Message) -> None:
     
     try:
         # Проверяем существует ли пользователь в БД
-        if not await db.user_exists(user_id):
+        if not await user_store.user_exists(user_id):
             # Если нет - создаем нового пользователя
-            await db.create_user(user_id)
+            await user_store.create_user(user_id)
             logger.info(f"Создан новый пользователь с ID: {user_id}")
         
         await message.answer(
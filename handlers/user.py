@@ -12,6 +12,7 @@ from bot.keyboards.keyboards import (
     get_settings_keyboard
 )
 from bot.services.database import Database
+from bot.services.user_store import user_store, UserProfile
 from bot.services.parser import ScheduleParser
 from bot.config import logger, WEEKDAYS, config
 from bot.middlewares import ScheduleFormatter
@@ -110,10 +111,10 @@ async def back_to_main_menu(message: Message, state: FSMContext):
     )
 @router.message(F.text == "⚙️ Настройки")
 @user_exists_check()
-async def settings_menu(message: Message, state: FSMContext):
+async def settings_menu(message: Message, state: FSMContext, user_profile: UserProfile):
     """Обработчик меню настроек"""
     user_id = message.from_user.id
-    user_data = await db.get_user(user_id)
+    user_data = user_profile.as_dict() if user_profile else None
     
     if not user_data:
         logger.error(f"Не удалось получить данные пользователя {user_id}")
@@ -144,17 +145,17 @@ async def settings_menu(message: Message, state: FSMContext):
     )
 
 @router.callback_query(lambda c: c.data == "toggle_notifications")
-async def toggle_notifications_callback(callback: CallbackQuery):
+async def toggle_notifications_callback(callback: CallbackQuery, user_profile: UserProfile):
     """Обработчик включения/выключения уведомлений"""
     user_id = callback.from_user.id
-    user_data = await db.get_user(user_id)
+    user_data = user_profile.as_dict() if user_profile else None
     
     if not user_data:
         await callback.answer("❌ Ошибка получения данных пользователя")
         return
 
     new_status = not user_data.get('notifications', False)
-    if await db.toggle_notifications(user_id, new_status):
+    if await user_store.toggle_notifications(user_id, new_status):
         user_data['notifications'] = new_status
         await callback.message.edit_reply_markup(reply_markup=get_settings_keyboard(user_data))
         await callback.answer("✅ Настройки уведомлений обновлены")
@@ -247,10 +248,10 @@ async def process_admin_message(message: Message, state: FSMContext):
 
 @router.message(F.text == "расписание")
 @user_exists_check()
-async def schedule_start(message: Message, state: FSMContext):
+async def schedule_start(message: Message, state: FSMContext, user_profile: UserProfile):
     user_id = message.from_user.id
     logger.info(f"Пользователь {user_id} запросил расписание")
-    user_data = await db.get_user(user_id)
+    user_data = user_profile.as_dict() if user_profile else None
     
     if not user_data or not user_data.get('role'):
         logger.info(f"Пользователь {user_id} еще не выбрал роль")
@@ -298,7 +299,7 @@ async def process_role_selection(message: Message, state: FSMContext):
         return
 
     logger.info(f"Пользователь {user_id} выбрал роль: {message.text}")
-    await db.update_user_role(user_id, message.text)
+    await user_store.update_user_role(user_id, message.text)
 
     if message.text == "Студент":
         logger.info(f"Запрашиваем список групп для пользователя {user_id}")
@@ -328,7 +329,7 @@ async def process_group_selection(message: Message, state: FSMContext):
     user_id = message.from_user.id
 
     logger.info(f"Пользователь {user_id} выбрал группу: {message.text}")
-    await db.update_selected_group(user_id, message.text)
+    await user_store.update_selected_group(user_id, message.text)
     
     await message.answer(
         "📅 Выберите день недели:",
@@ -341,7 +342,7 @@ async def process_teacher_selection(message: Message, state: FSMContext):
     user_id = message.from_user.id
 
     logger.info(f"Пользователь {user_id} выбрал преподавателя: {message.text}")
-    await db.update_selected_teacher(user_id, message.text)
+    await user_store.update_selected_teacher(user_id, message.text)
     
     await message.answer(
         "📅 Выберите день недели:",
@@ -350,9 +351,8 @@ async def process_teacher_selection(message: Message, state: FSMContext):
     await state.set_state(ScheduleStates.waiting_for_day)
 
 @router.message(ScheduleStates.waiting_for_day)
-async def process_day_selection(message: Message, state: FSMContext):
-    user_id = message.from_user.id
-    user_data = await db.get_user(user_id)
+async def process_day_selection(message: Message, state: FSMContext, user_profile: UserProfile):
+    user_data = user_profile.as_dict() if user_profile else None
     parser = ScheduleParser()
     
     if message.text == "Показать всё расписание":
@@ -1,6 +1,27 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from bot.config import config, logger
 
+# Заранее построенные клавиатуры списков: вид -> (список, клавиатура).
+# Перестраиваются при изменении расписания (см. prebuild_list_keyboards)
+_prebuilt = {}
+
+
+def _prebuilt_keyboard(kind: str, values: list, build) -> ReplyKeyboardMarkup:
+    """Клавиатура для списка; повторно строится только при изменении списка"""
+    key = tuple(values or ())
+    cached = _prebuilt.get(kind)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    keyboard = build(values)
+    _prebuilt[kind] = (key, keyboard)
+    return keyboard
+
+
+def prebuild_list_keyboards(groups: list, teachers: list):
+    """Построение клавиатур групп и преподавателей до первого запроса"""
+    get_groups_keyboard(groups)
+    get_teachers_keyboard(teachers)
+
 
 def get_start_keyboard(user_id: int = None) -> ReplyKeyboardMarkup:
     
@@ -56,6 +77,10 @@ def get_role_keyboard() -> ReplyKeyboardMarkup:
     ]
     return ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
 def get_groups_keyboard(groups: list) -> ReplyKeyboardMarkup:
+    """Клавиатура с группами"""
+    return _prebuilt_keyboard('groups', groups, _build_groups_keyboard)
+
+def _build_groups_keyboard(groups: list) -> ReplyKeyboardMarkup:
     """Создание клавиатуры с группами"""
     kb = []
     try:
@@ -83,6 +108,10 @@ def get_groups_keyboard(groups: list) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
 
 def get_teachers_keyboard(teachers: list) -> ReplyKeyboardMarkup:
+    """Клавиатура со списком преподавателей"""
+    return _prebuilt_keyboard('teachers', teachers, _build_teachers_keyboard)
+
+def _build_teachers_keyboard(teachers: list) -> ReplyKeyboardMarkup:
     """Создает клавиатуру со списком преподавателей"""
     if not teachers:
         logger.warning("Получен пустой список преподавателей")
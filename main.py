@@ -4,10 +4,18 @@ import sys
 from aiogram import Bot, Dispatcher
 from bot.config import config, logger
 from bot.handlers import main_router
-from bot.services.scheduler import start_scheduler
+from bot.services.scheduler import get_updater, start_scheduler
+from bot.services.parser import ScheduleParser, parse_executor
+from bot.services.driver_pool import driver_pool
+from bot.services.database import Database, CACHE_GROUPS, CACHE_TEACHERS, firestore_executor
+from bot.keyboards.keyboards import prebuild_list_keyboards
+from bot.services.storage import get_backend
+from bot.services.user_store import user_store
+from bot.services.outbox import outbox
 from bot.middleware.rate_limit import RateLimitMiddleware
 from bot.middleware.spam_protection import SpamProtection
 from bot.middleware.performance import PerformanceMiddleware
+from bot.middleware.user_context import UserContextMiddleware
 from bot.services.monitoring import monitor
 from contextlib import asynccontextmanager
 
@@ -20,6 +28,11 @@ class BotApp:
 
     async def setup(self):
         """Настройка бота и middleware"""
+        # Профиль пользователя загружается один раз до фильтров и обработчиков
+        user_context = UserContextMiddleware()
+        self.dp.message.outer_middleware(user_context)
+        self.dp.callback_query.outer_middleware(user_context)
+        
         # Подключаем middleware
         self.dp.message.middleware(RateLimitMiddleware())
         self.dp.message.middleware(SpamProtection())
@@ -28,6 +41,19 @@ class BotApp:
         # Регистрация роутеров
         self.dp.include_router(main_router)
 
+        # Изменения расписания приходят по подписке во все процессы бота
+        db = Database()
+        db.add_schedule_listener(self.refresh_keyboards)
+        await db.start_listening()
+
+    async def refresh_keyboards(self, keys):
+        """Перестроение клавиатур групп и преподавателей после изменения списков"""
+        if CACHE_GROUPS not in keys and CACHE_TEACHERS not in keys:
+            return
+        db = Database()
+        groups, teachers = await asyncio.gather(db.get_cached_groups(), db.get_cached_teachers())
+        prebuild_list_keyboards(groups, teachers)
+
     async def start(self):
         """Запуск всех сервисов бота"""
         await self.setup()
@@ -35,7 +61,8 @@ class BotApp:
         # Запускаем фоновые задачи
         self.tasks.extend([
             asyncio.create_task(self.metrics_collector()),
-            asyncio.create_task(start_scheduler(self.bot))
+            asyncio.create_task(start_scheduler(self.bot)),
+            asyncio.create_task(user_store.run())
         ])
         
         logger.info("Bot services started")
@@ -53,6 +80,25 @@ class BotApp:
             except asyncio.CancelledError:
                 pass
         
+        # Прерываем фоновую рассылку: неотправленное останется в очереди до запуска
+        updater = get_updater()
+        if updater and updater.notifier:
+            await updater.notifier.stop_sending()
+        
+        # Сохраняем отложенные изменения пользователей
+        await user_store.close()
+        Database().stop_listening()
+        outbox.close()
+        
+        # Закрываем HTTP-сессию парсера
+        await ScheduleParser.close_http_session()
+        
+        # Закрываем браузеры парсера
+        driver_pool.shutdown()
+        parse_executor.shutdown()
+        firestore_executor.shutdown()
+        get_backend().close()
+        
         # Закрываем сессию бота
         await self.bot.session.close()
         logger.info("Bot shutdown complete")
@@ -0,0 +1,36 @@
+from aiogram import BaseMiddleware
+from aiogram.types import Message, CallbackQuery
+from bot.config import logger, config
+from bot.services.user_store import user_store
+
+START_REQUIRED_TEXT = "⚠️ Для использования бота необходимо выполнить команду /start"
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Загрузка профиля пользователя один раз на обновление
+
+    Профиль передается в обработчики как data['user_profile'] (UserProfile).
+    Обновления от пользователей, которых нет в базе, дальше не проходят;
+    исключения - команда /start и администратор.
+    """
+
+    async def __call__(self, handler, event: Message | CallbackQuery, data):
+        user = event.from_user
+        if user is None:
+            return await handler(event, data)
+
+        try:
+            profile = await user_store.get_profile(user.id)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке профиля пользователя {user.id}: {e}")
+            await event.answer("❌ Произошла ошибка. Попробуйте позже.")
+            return
+
+        is_start = isinstance(event, Message) and bool(event.text) and event.text.startswith('/start')
+        if profile is None and not is_start and user.id != config.admin_id:
+            logger.info(f"Пользователь {user.id} не найден в БД")
+            await event.answer(START_REQUIRED_TEXT)
+            return
+
+        data['user_profile'] = profile
+        return await handler(event, data)
@@ -3,6 +3,8 @@ import logging
 from datetime import datetime
 from typing import List, Dict, Any
 from bot.config import format_date
+from bot.utils.schedule_calendar import WEEKDAY_NAMES, parse_date_key
+from bot.utils.schedule_diff import ADDED, MOVED, REMOVED, ROOM, TEACHER, LessonChange
 
 logger = logging.getLogger(__name__)
 
@@ -52,21 +54,10 @@ def format_date(date_str: str) -> str:
         else:
             return date_str
             
-        # Создаем объект datetime
-        current_year = datetime.now().year
-        date_obj = datetime.strptime(f"{day}-{month}-{current_year}", "%d-%b-%Y")
-        
-        # Получаем день недели
-        weekday_ru = {
-            'Monday': 'понедельник',
-            'Tuesday': 'вторник',
-            'Wednesday': 'среда',
-            'Thursday': 'четверг',
-            'Friday': 'пятница',
-            'Saturday': 'суббота',
-            'Sunday': 'воскресенье'
-        }
-        weekday = weekday_ru[date_obj.strftime('%A')]
+        date_obj = parse_date_key(date_str)
+        if date_obj is None:
+            raise ValueError(f"Не удалось распознать дату {date_str}")
+        weekday = WEEKDAY_NAMES[date_obj.weekday()]
         
         # Форматируем дату в нужный формат
         return f"{day}-{month} ({weekday})"
@@ -157,6 +148,55 @@ class ScheduleFormatter:
 
         return "\n".join(response)
 
+    @staticmethod
+    def format_changes(changes: List[LessonChange], day: str, user_data: dict) -> str:
+        """Форматирование изменений расписания на день (что именно поменялось)"""
+        is_student = user_data.get('role') == 'Студент'
+        header = "✏️ Изменения в расписании "
+        if is_student:
+            header += f"группы {user_data.get('selected_group')}\n\n"
+        else:
+            header += f"преподавателя {user_data.get('selected_teacher')}\n\n"
+
+        response = [
+            header,
+            f"📅 {format_date(day)}",
+            "❄️═════════════════════❄️\n"
+        ]
+
+        def lesson_number(change: LessonChange) -> int:
+            try:
+                return int((change.new or change.old).get('number'))
+            except (TypeError, ValueError):
+                return 0
+
+        for change in sorted(changes, key=lesson_number):
+            response.append(ScheduleFormatter._format_change(change, show_group=not is_student))
+        return "\n".join(response)
+
+    @staticmethod
+    def _format_change(change: LessonChange, show_group: bool) -> str:
+        """Одна строка об изменении пары"""
+        old, new = change.old or {}, change.new or {}
+        lesson = new or old
+        where = f"{lesson.get('number')} пара, {lesson.get('discipline')}"
+        if show_group:
+            where += f" ({change.group})"
+
+        if change.kind == ADDED:
+            details = f"каб. {new.get('classroom')}" if show_group else f"{new.get('teacher')}, каб. {new.get('classroom')}"
+            return f"➕ {where}: {details}"
+        if change.kind == REMOVED:
+            return f"➖ {where}: отменена"
+        if change.kind == MOVED:
+            moved = f"{new.get('discipline')}" + (f" ({change.group})" if show_group else "")
+            return f"🔀 {moved}: {old.get('number')} пара → {new.get('number')} пара"
+        if change.kind == ROOM:
+            return f"⛄️ {where}: кабинет {old.get('classroom')} → {new.get('classroom')}"
+        if change.kind == TEACHER:
+            return f"🎅 {where}: {old.get('teacher')} → {new.get('teacher')}"
+        return f"✏️ {where}"
+
     @staticmethod
     def _can_group_lessons(lesson1: dict, lesson2: dict) -> bool:
         """Проверка возможности группировки пар"""
@@ -190,13 +230,7 @@ class ScheduleFormatter:
         
         # Сортируем дни по дате
         def parse_date(date_str):
-            try:
-                if '-' in date_str:
-                    day, month = date_str.split('-')
-                    return datetime.strptime(f"{day}-{month}-{datetime.now().year}", "%d-%b-%Y")
-                return datetime.max
-            except:
-                return datetime.max
+            return parse_date_key(date_str) or datetime.max.date()
 
         sorted_dates = sorted(schedule_data.keys(), key=parse_date)
 
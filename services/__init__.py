@@ -1,4 +1,12 @@
 from .database import Database
-from .firebase import db
 
-__all__ = ['Database', 'db']
\ No newline at end of file
+
+def __getattr__(name):
+    # Клиент Firestore создается только по запросу
+    if name == 'db':
+        from .firebase import get_client
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['Database', 'db']
@@ -1,12 +1,84 @@
-from typing import Dict, Any, Optional, List
-from firebase_admin import firestore
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Set
 from bot.services.database_config import get_database
+from bot.services.storage import REMOVED, ArrayRemove, ArrayUnion, DocumentChange, Increment, SERVER_TIMESTAMP
 from bot.config import logger
+from bot.services.executor import BlockingExecutor
+from bot.utils.schedule_hash import content_hash
+from bot.utils.schedule_model import CompactSchedule
+from bot.utils.schedule_shards import plan_shards, shard_id
+from bot.utils.schedule_snapshot import LazySchedule, SnapshotStats, encode_snapshot, load_schedule
+from bot.utils.subscriptions import (
+    GROUP, TEACHER, build_subscriptions, subscription_changes, subscription_document_id, subscription_key
+)
+from bot.utils.user_stats import aggregate_users, counter_delta, empty_stats, nest_counters
 from datetime import datetime
+import asyncio
+import functools
+import os
 import time
 
 db = get_database()
 
+# Формат записи schedule/current: map - вложенный словарь, msgpack - сжатый снимок.
+# Читаются оба формата, поэтому переключение не требует миграции
+SCHEDULE_FORMAT = os.getenv('SCHEDULE_FORMAT', 'map')
+
+# Синхронный клиент Firestore работает в отдельном ограниченном пуле,
+# чтобы сетевые запросы не блокировали цикл событий
+FIRESTORE_WORKERS = 8
+FIRESTORE_RPC_TIMEOUT = 10  # время на один запрос к Firestore
+FIRESTORE_TIMEOUT = 15  # общее ожидание вызова вместе с очередью пула
+FIRESTORE_BATCH_LIMIT = 500  # максимум операций в одном пакете Firestore
+firestore_executor = BlockingExecutor("firestore", FIRESTORE_WORKERS)
+
+# Ключи кэша документов в памяти
+CACHE_SCHEDULE = 'schedule'
+CACHE_GROUPS = 'groups'
+CACHE_TEACHERS = 'teachers'
+CACHE_MANIFEST = 'manifest'
+CACHE_INFO = 'info'
+
+# Документы schedule/*, которые подписка держит в кэше: id -> (ключ кэша, преобразование)
+WATCHED_SCHEDULE_DOCUMENTS = {
+    'current': (CACHE_SCHEDULE, load_schedule),
+    'groups': (CACHE_GROUPS, None),
+    'teachers': (CACHE_TEACHERS, None),
+    'manifest': (CACHE_MANIFEST, None)
+}
+
+
+class BatchWriteError(Exception):
+    """Сбой пакетной записи: первые committed операций записаны
+
+    Если outcome_unknown, исход пакета с операциями до batch_end неизвестен
+    (истекло время ожидания, но запись могла завершиться в пуле).
+    """
+
+    def __init__(self, cause: Exception, committed: int, batch_end: int, outcome_unknown: bool):
+        super().__init__(str(cause) or type(cause).__name__)
+        self.committed = committed
+        self.batch_end = batch_end
+        self.outcome_unknown = outcome_unknown
+
+
+@dataclass
+class UserWriteResult:
+    """Итог пакетной записи пользователей: что нужно записать повторно"""
+    failed: bool = False
+    updates: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    stats_delta: Dict[tuple, int] = field(default_factory=dict)
+    subscriptions: Dict[tuple, Dict[int, bool]] = field(default_factory=dict)
+
+
+@dataclass
+class CacheEntry:
+    """Закэшированный документ и версия (update_time), из которой он прочитан"""
+    data: Dict[str, Any]
+    version: Any
+    loaded_at: float
+
+
 class Database:
     _instance = None
 
@@ -25,11 +97,306 @@ class Database:
         self.users_collection = self.db.collection('users')
         self.schedule_collection = self.db.collection('schedule')
         self.cache_collection = self.db.collection('cache')
+        # Агрегаты пользователей (stats/users), обновляются вместе с изменениями пользователей
+        self.stats_collection = self.db.collection('stats')
+        # Шарды расписания: документ на (дата, группа) и на преподавателя
+        self.group_shards_collection = self.db.collection('schedule_groups')
+        self.teacher_shards_collection = self.db.collection('schedule_teachers')
+        # Индекс подписок: документ на группу и на преподавателя со списком user_id
+        self.subscriptions_collection = self.db.collection('subscriptions')
         
         logger.info("База данных успешно инициализирована")
         self._initialized = True
-        self._cache = {}
+        # Кэш документов: ключ -> CacheEntry. Запись целиком заменяется новой,
+        # поэтому читатели всегда видят согласованную версию
+        self._cache: Dict[str, CacheEntry] = {}
         self._cache_timeout = 300  # 5 минут
+        self._cache_locks: Dict[str, asyncio.Lock] = {}
+        self._cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        # Компактная копия расписания и версия документа, из которой она построена
+        self._compact_schedule = None
+        self._compact_schedule_version = None
+        # Запись отложенных изменений пользователей (см. UserProfileStore)
+        self._write_behind = None
+        # Размеры и время кодирования последнего записанного снимка расписания
+        self._snapshot_stats: Optional[SnapshotStats] = None
+        # Шарды и манифест соответствуют schedule/current: True - записаны этим процессом,
+        # False - запись не удалась или идет, None - неизвестно (сверяется по хэшу в манифесте)
+        self._shards_synced: Optional[bool] = None
+        # Подписка на schedule/* и ожидающие события "расписание изменилось"
+        self._schedule_watch = None
+        self._schedule_waiter: Optional[asyncio.Future] = None
+        self._schedule_listeners = []
+
+    def set_write_behind(self, flush):
+        """Регистрация функции, сохраняющей отложенные изменения пользователей"""
+        self._write_behind = flush
+
+    async def _flush_write_behind(self):
+        """Запись отложенных изменений перед запросами по всей коллекции пользователей"""
+        if self._write_behind:
+            await self._write_behind()
+
+    async def _run(self, func, *args, **kwargs):
+        """Вызов синхронного клиента Firestore в пуле с ограничением по времени"""
+        return await firestore_executor.run(functools.partial(func, *args, **kwargs), timeout=FIRESTORE_TIMEOUT)
+
+    async def _get(self, ref):
+        """Чтение документа"""
+        return await self._run(ref.get, timeout=FIRESTORE_RPC_TIMEOUT)
+
+    async def _set(self, ref, data: Dict[str, Any], merge: bool = False):
+        """Запись документа"""
+        return await self._run(ref.set, data, merge=merge, timeout=FIRESTORE_RPC_TIMEOUT)
+
+    async def _update(self, ref, data: Dict[str, Any]):
+        """Частичное обновление документа"""
+        return await self._run(ref.update, data, timeout=FIRESTORE_RPC_TIMEOUT)
+
+    async def _commit(self, batch):
+        """Применение пакета записей"""
+        return await self._run(batch.commit, timeout=FIRESTORE_RPC_TIMEOUT)
+
+    async def _commit_in_batches(self, operations: list):
+        """Запись операций (ref, данные, merge) пакетами; данные None - удаление документа
+
+        При сбое бросает BatchWriteError с числом уже записанных операций.
+        """
+        for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+            end = min(start + FIRESTORE_BATCH_LIMIT, len(operations))
+            batch = self.db.batch()
+            for ref, data, merge in operations[start:end]:
+                if data is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, data, merge=merge)
+            try:
+                await self._commit(batch)
+            except asyncio.TimeoutError as e:
+                raise BatchWriteError(e, start, end, outcome_unknown=True) from e
+            except Exception as e:
+                raise BatchWriteError(e, start, end, outcome_unknown=False) from e
+
+    async def _stream(self, query) -> list:
+        """Чтение всех документов запроса (итерация по потоку тоже идет в пуле)"""
+        return await self._run(lambda: list(query.stream(timeout=FIRESTORE_RPC_TIMEOUT)))
+
+    async def get_many(self, refs: list) -> Dict[str, Any]:
+        """Чтение нескольких документов одним запросом: id документа -> снимок"""
+        if not refs:
+            return {}
+        docs = await self._run(lambda: list(self.db.get_all(refs, timeout=FIRESTORE_RPC_TIMEOUT)))
+        return {doc.id: doc for doc in docs}
+
+    def _cache_fresh(self, entry: Optional[CacheEntry], key: Optional[str] = None) -> bool:
+        if entry is None:
+            return False
+        # Документы под активной подпиской обновляются ею и не устаревают
+        if key in self._watched_keys() and self.is_listening():
+            return True
+        return time.monotonic() - entry.loaded_at < self._cache_timeout
+
+    @staticmethod
+    def _watched_keys() -> Set[str]:
+        return {key for key, _ in WATCHED_SCHEDULE_DOCUMENTS.values()}
+
+    async def _read_through(self, key: str, ref, decode=None) -> Optional[CacheEntry]:
+        """Документ из кэша в памяти; при промахе или устаревании - из Firestore
+
+        decode преобразует прочитанный документ перед тем, как положить его в кэш.
+        """
+        entry = self._cache.get(key)
+        if self._cache_fresh(entry, key):
+            self._cache_stats['hits'] += 1
+            return entry
+
+        # Одновременные промахи по одному ключу загружают документ один раз
+        lock = self._cache_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._cache.get(key)
+            if self._cache_fresh(entry, key):
+                self._cache_stats['hits'] += 1
+                return entry
+
+            self._cache_stats['misses'] += 1
+            doc = await self._get(ref)
+            if not doc.exists:
+                self._cache.pop(key, None)
+                return None
+
+            current = self._cache.get(key)
+            if current is not None and current.version and doc.update_time and current.version > doc.update_time:
+                # Пока шло чтение, в кэш уже положили более новую запись
+                return current
+            data = doc.to_dict()
+            entry = CacheEntry(decode(data) if decode else data, doc.update_time, time.monotonic())
+            self._cache[key] = entry
+            return entry
+
+    def _swap_cache(self, key: str, data: Dict[str, Any], version: Any):
+        """Замена закэшированного документа только что записанной версией"""
+        self._cache[key] = CacheEntry(data, version, time.monotonic())
+
+    def invalidate_cache(self, *keys: str):
+        """Сброс закэшированных документов (без аргументов - всех)"""
+        for key in keys or list(self._cache):
+            if self._cache.pop(key, None) is not None:
+                self._cache_stats['invalidations'] += 1
+
+    async def start_listening(self) -> bool:
+        """Подписка на изменения schedule/*: кэш обновляется без чтений по запросу"""
+        if self.is_listening():
+            return True
+        loop = asyncio.get_running_loop()
+
+        def on_changes(changes: List[DocumentChange]):
+            # Вызывается в потоке хранилища - обработка идет в цикле событий
+            loop.call_soon_threadsafe(self._apply_schedule_changes, changes)
+
+        try:
+            self._schedule_watch = self.db.watch('schedule', on_changes)
+            logger.info("Подписка на изменения расписания запущена")
+            return True
+        except NotImplementedError as e:
+            logger.warning(f"{e}: расписание обновляется по истечении кэша")
+        except Exception as e:
+            logger.error(f"Ошибка при подписке на изменения расписания: {e}")
+        return False
+
+    def stop_listening(self):
+        """Отмена подписки на изменения расписания"""
+        if self._schedule_watch is not None:
+            self._schedule_watch.unsubscribe()
+            self._schedule_watch = None
+
+    def is_listening(self) -> bool:
+        return self._schedule_watch is not None and self._schedule_watch.is_active
+
+    def _apply_schedule_changes(self, changes: List[DocumentChange]):
+        """Обновление кэша документами, пришедшими по подписке"""
+        changed = set()
+        for change in changes:
+            watched = WATCHED_SCHEDULE_DOCUMENTS.get(change.document.id)
+            if watched is None:
+                continue
+            key, decode = watched
+            if change.kind == REMOVED:
+                self.invalidate_cache(key)
+                changed.add(key)
+                continue
+
+            version = change.document.update_time
+            current = self._cache.get(key)
+            if current is not None and current.version and version and current.version >= version:
+                # Эту версию процесс записал сам или уже получил
+                continue
+            try:
+                data = change.document.to_dict()
+                self._cache[key] = CacheEntry(decode(data) if decode else data, version, time.monotonic())
+            except Exception as e:
+                self.invalidate_cache(key)
+                logger.error(f"Ошибка при обработке изменения schedule/{change.document.id}: {e}")
+            changed.add(key)
+
+        if changed:
+            logger.info(f"Получены изменения расписания: {', '.join(sorted(changed))}")
+            self._emit_schedule_change(changed)
+
+    def add_schedule_listener(self, callback):
+        """Регистрация обработчика изменений расписания callback(ключи кэша); может быть async"""
+        self._schedule_listeners.append(callback)
+
+    async def wait_schedule_change(self, timeout: Optional[float] = None) -> Set[str]:
+        """Ожидание следующего изменения расписания; возвращает изменившиеся ключи кэша"""
+        if self._schedule_waiter is None or self._schedule_waiter.done():
+            self._schedule_waiter = asyncio.get_running_loop().create_future()
+        return await asyncio.wait_for(asyncio.shield(self._schedule_waiter), timeout)
+
+    def _emit_schedule_change(self, keys: Set[str]):
+        """Событие "расписание изменилось" для ожидающих и обработчиков"""
+        if CACHE_SCHEDULE in keys and self._compact_schedule is not None:
+            # Компактная копия уже используется - подменяем ее сразу, а не на первом запросе;
+            # дни снимка при этом не распаковываются, это произойдет при чтении
+            entry = self._cache.get(CACHE_SCHEDULE)
+            if entry is not None:
+                self._compact_schedule = CompactSchedule.from_dict(entry.data)
+                self._compact_schedule_version = entry.version
+
+        waiter, self._schedule_waiter = self._schedule_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(keys)
+        for callback in self._schedule_listeners:
+            try:
+                result = callback(keys)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике изменения расписания: {e}")
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Статистика попаданий в кэш документов"""
+        hits = self._cache_stats['hits']
+        misses = self._cache_stats['misses']
+        total = hits + misses
+        now = time.monotonic()
+        return {
+            **self._cache_stats,
+            'hit_rate': hits / total * 100 if total else 0,
+            'listening': self.is_listening(),
+            'entries': {key: round(now - entry.loaded_at) for key, entry in self._cache.items()}
+        }
+
+    async def get_users(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Получение данных нескольких пользователей за один запрос"""
+        try:
+            refs = [self.users_collection.document(str(user_id)) for user_id in user_ids]
+            docs = await self.get_many(refs)
+            return {int(doc_id): doc.to_dict() for doc_id, doc in docs.items() if doc.exists}
+        except Exception as e:
+            logger.error(f"Ошибка при получении пользователей {len(user_ids)}: {e}")
+            return {}
+
+    def _stats_increments(self, delta: Dict[tuple, int]) -> Dict[str, Any]:
+        """Изменения агрегатов в виде атомарных инкрементов для записи с merge"""
+        return nest_counters({key: Increment(value) for key, value in delta.items()})
+
+    def _subscription_writes(self, changes: Dict[tuple, Dict[int, bool]]) -> list:
+        """Изменения индекса подписок в виде записей (ref, данные) с merge"""
+        writes = []
+        for key, users in changes.items():
+            ref = self.subscriptions_collection.document(subscription_document_id(key))
+            added = [user_id for user_id, subscribed in users.items() if subscribed]
+            removed = [user_id for user_id, subscribed in users.items() if not subscribed]
+            if added:
+                writes.append((ref, {'kind': key[0], 'target': key[1], 'user_ids': ArrayUnion(added)}))
+            if removed:
+                writes.append((ref, {'kind': key[0], 'target': key[1], 'user_ids': ArrayRemove(removed)}))
+        return writes
+
+    def _write_user_transaction(self, user_id: int, fields: Dict[str, Any], replace: bool = False):
+        """Запись пользователя и агрегатов в одной транзакции (выполняется в пуле)"""
+        user_ref = self.users_collection.document(str(user_id))
+        stats_ref = self.stats_collection.document('users')
+
+        def apply(transaction):
+            snapshot = transaction.get(user_ref)
+            old = snapshot.to_dict() if snapshot.exists else None
+            if replace:
+                transaction.set(user_ref, fields)
+                new = fields
+            else:
+                transaction.update(user_ref, fields)
+                new = {**(old or {}), **fields}
+            delta = counter_delta(old, new)
+            if delta:
+                transaction.set(stats_ref, self._stats_increments(delta), merge=True)
+            for ref, data in self._subscription_writes(subscription_changes(user_id, old, new)):
+                transaction.set(ref, data, merge=True)
+
+        self.db.run_transaction(apply)
+
+    async def _write_user(self, user_id: int, fields: Dict[str, Any], replace: bool = False):
+        await self._run(self._write_user_transaction, user_id, fields, replace)
 
     async def create_user(self, user_id: int) -> bool:
         """Создание нового пользователя с дефолтными значениями"""
@@ -40,10 +407,10 @@ class Database:
                 "selected_teacher": None, 
                 "selected_group": None,
                 "notifications": False,
-                "created_at": firestore.SERVER_TIMESTAMP
+                "created_at": SERVER_TIMESTAMP
             }
             
-            self.users_collection.document(str(user_id)).set(user_data)
+            await self._write_user(user_id, user_data, replace=True)
             logger.info(f"Пользователь {user_id} успешно создан")
             return True
         except Exception as e:
@@ -53,7 +420,7 @@ class Database:
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получение данных пользователя"""
         try:
-            doc = self.users_collection.document(str(user_id)).get()
+            doc = await self._get(self.users_collection.document(str(user_id)))
             if doc.exists:
                 logger.info(f"Получены данные пользователя {user_id}")
                 return doc.to_dict()
@@ -63,10 +430,59 @@ class Database:
             logger.error(f"Ошибка при получении пользователя {user_id}: {e}")
             return None
 
+    async def read_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Чтение пользователя без перехвата ошибок (None - документа нет)"""
+        doc = await self._get(self.users_collection.document(str(user_id)))
+        return doc.to_dict() if doc.exists else None
+
+    async def apply_user_updates(self, updates: Dict[int, Dict[str, Any]],
+                                 stats_delta: Optional[Dict[tuple, int]] = None,
+                                 subscriptions: Optional[Dict[tuple, Dict[int, bool]]] = None) -> UserWriteResult:
+        """Пакетная запись изменений нескольких пользователей, агрегатов и индекса подписок
+
+        Возвращает то, что не записано и должно быть повторено. Профили и индекс
+        пишутся через merge и повторяются без вреда; инкременты агрегатов идут
+        последними и не повторяются, если их пакет мог быть записан.
+        """
+        operations, sources = [], []
+        for user_id, fields in updates.items():
+            operations.append((self.users_collection.document(str(user_id)), fields, True))
+            sources.append(('user', user_id))
+        for key, users in (subscriptions or {}).items():
+            for ref, data in self._subscription_writes({key: users}):
+                operations.append((ref, data, True))
+                sources.append(('subscription', key))
+        if stats_delta:
+            operations.append((self.stats_collection.document('users'), self._stats_increments(stats_delta), True))
+            sources.append(('stats', None))
+
+        try:
+            await self._commit_in_batches(operations)
+            logger.info(f"Сохранены изменения {len(updates)} пользователей")
+            return UserWriteResult()
+        except Exception as e:
+            error = e if isinstance(e, BatchWriteError) else BatchWriteError(e, 0, len(operations), False)
+            logger.error(f"Ошибка при пакетном обновлении пользователей: {e}")
+
+        result = UserWriteResult(failed=True)
+        for index in range(error.committed, len(operations)):
+            kind, key = sources[index]
+            if kind == 'user':
+                result.updates[key] = updates[key]
+            elif kind == 'subscription':
+                result.subscriptions[key] = subscriptions[key]
+            elif error.outcome_unknown and index < error.batch_end:
+                # Пакет с инкрементами мог записаться - повтор задвоил бы агрегаты,
+                # расхождение поправит ночной пересчет
+                logger.warning("Исход записи агрегатов пользователей неизвестен, повтор пропущен")
+            else:
+                result.stats_delta = stats_delta
+        return result
+
     async def update_user_role(self, user_id: int, role: str) -> bool:
         """Обновление роли пользователя"""
         try:
-            self.users_collection.document(str(user_id)).update({"role": role})
+            await self._write_user(user_id, {"role": role})
             logger.info(f"Роль пользователя {user_id} обновлена на {role}")
             return True
         except Exception as e:
@@ -76,7 +492,7 @@ class Database:
     async def update_selected_teacher(self, user_id: int, teacher: str) -> bool:
         """Обновление выбранного преподавателя"""
         try:
-            self.users_collection.document(str(user_id)).update({"selected_teacher": teacher})
+            await self._write_user(user_id, {"selected_teacher": teacher})
             logger.info(f"Выбранный преподаватель пользователя {user_id} обновлен на {teacher}")
             return True
         except Exception as e:
@@ -86,7 +502,7 @@ class Database:
     async def update_selected_group(self, user_id: int, group: str) -> bool:
         """Обновление выбранной группы"""
         try:
-            self.users_collection.document(str(user_id)).update({"selected_group": group})
+            await self._write_user(user_id, {"selected_group": group})
             logger.info(f"Выбранная группа пользователя {user_id} обновлена на {group}")
             return True
         except Exception as e:
@@ -96,7 +512,7 @@ class Database:
     async def toggle_notifications(self, user_id: int, enabled: bool) -> bool:
         """Включение/выключение уведомлений"""
         try:
-            self.users_collection.document(str(user_id)).update({"notifications": enabled})
+            await self._write_user(user_id, {"notifications": enabled})
             logger.info(f"Уведомления для пользователя {user_id} {'включены' if enabled else 'выключены'}")
             return True
         except Exception as e:
@@ -106,7 +522,7 @@ class Database:
     async def user_exists(self, user_id: int) -> bool:
         """Проверка существования пользователя"""
         try:
-            doc = self.users_collection.document(str(user_id)).get()
+            doc = await self._get(self.users_collection.document(str(user_id)))
             exists = doc.exists
             logger.info(f"Проверка существования пользователя {user_id}: {'существует' if exists else 'не существует'}")
             return exists
@@ -114,36 +530,200 @@ class Database:
             logger.error(f"Ошибка при проверке существования пользователя {user_id}: {e}")
             return False
 
-    async def update_schedule(self, schedule_data: Dict[str, Any]) -> bool:
-        """Обновление расписания"""
+    def _schedule_document(self, schedule_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Документ schedule/current в выбранном формате хранения"""
+        if SCHEDULE_FORMAT != 'msgpack':
+            return schedule_data
+        document, stats = encode_snapshot(schedule_data)
+        self._snapshot_stats = stats
+        logger.info(
+            f"Снимок расписания: {stats.dates} дней, {stats.raw_size} -> {stats.size} байт "
+            f"(x{stats.ratio:.1f}), кодирование {stats.encode_ms:.1f} мс"
+        )
+        return document
+
+    async def update_schedule(self, schedule_data: Dict[str, Any],
+                              hashes: Optional[Dict[str, Dict[str, str]]] = None) -> bool:
+        """Обновление расписания (hashes - уже посчитанные хэши корзин новой версии)"""
         try:
-            self.schedule_collection.document('current').set(schedule_data)
+            result = await self._set(self.schedule_collection.document('current'),
+                                     self._schedule_document(schedule_data))
+            # Новая версия сразу попадает в кэш, следующее чтение не идет в Firestore
+            self._swap_cache(CACHE_SCHEDULE, schedule_data, result.update_time)
+            self._emit_schedule_change({CACHE_SCHEDULE})
             logger.info("Расписание успешно обновлено")
-            return True
         except Exception as e:
+            # Состояние документа неизвестно - перечитаем его при следующем запросе
+            self.invalidate_cache(CACHE_SCHEDULE)
             logger.error(f"Ошибка при обновлении расписания: {e}")
             return False
 
+        # Основная версия уже записана: сбой шардов не отменяет обновление,
+        # они будут дописаны в sync_schedule_shards при следующем запуске
+        if not await self.update_schedule_shards(schedule_data, hashes):
+            logger.warning("Шарды расписания не записаны, повтор при следующем обновлении")
+        return True
+
     async def get_schedule(self) -> Optional[Dict[str, Any]]:
         """Получение текущего расписания"""
         try:
-            doc = self.schedule_collection.document('current').get()
-            if doc.exists:
-                logger.info("Получено текущее расписание")
-                return doc.to_dict()
+            entry = await self._read_through(CACHE_SCHEDULE, self.schedule_collection.document('current'),
+                                             decode=load_schedule)
+            if entry:
+                return entry.data
             logger.warning("Расписание не найдено")
             return None
         except Exception as e:
             logger.error(f"Ошибка при получении расписания: {e}")
             return None
 
+    async def update_schedule_shards(self, schedule_data: Dict[str, Any],
+                                     hashes: Optional[Dict[str, Dict[str, str]]] = None) -> bool:
+        """Запись изменившихся шардов расписания и манифеста с версиями корзин"""
+        self._shards_synced = False
+        try:
+            manifest_ref = self.schedule_collection.document('manifest')
+            old_manifest = await self.get_schedule_manifest()
+            plan = plan_shards(old_manifest, schedule_data, hashes)
+            # Хэш содержимого, как в cache/info: по нему читатели проверяют, что шарды от текущей версии
+            plan.manifest['schedule_hash'] = getattr(schedule_data, 'hash', None) or content_hash(schedule_data)
+
+            operations = []
+            for (date, group), lessons in plan.group_writes.items():
+                operations.append((self.group_shards_collection.document(shard_id(date, group)),
+                                   {'date': date, 'group': group, 'lessons': lessons}, False))
+            for date, group in plan.group_deletes:
+                operations.append((self.group_shards_collection.document(shard_id(date, group)), None, False))
+            for teacher, days in plan.teacher_writes.items():
+                operations.append((self.teacher_shards_collection.document(shard_id(teacher)),
+                                   {'teacher': teacher, 'days': days}, False))
+            for teacher in plan.teacher_deletes:
+                operations.append((self.teacher_shards_collection.document(shard_id(teacher)), None, False))
+            # Манифест пишется последним: читатели видят новую версию только после шардов
+            operations.append((manifest_ref, {**plan.manifest, 'updated_at': SERVER_TIMESTAMP}, False))
+
+            await self._commit_in_batches(operations)
+            self._swap_cache(CACHE_MANIFEST, plan.manifest, None)
+            self._shards_synced = True
+            logger.info(f"Шарды расписания обновлены, изменено документов: {plan.operations}")
+            return True
+        except Exception as e:
+            self.invalidate_cache(CACHE_MANIFEST)
+            logger.error(f"Ошибка при обновлении шардов расписания: {e}")
+            return False
+
+    async def sync_schedule_shards(self) -> bool:
+        """Дозапись шардов, не совпадающих по хэшу с манифестом, для текущего расписания"""
+        if self._shards_synced is True:
+            return True
+        schedule = await self.get_schedule()
+        if not schedule:
+            return False
+        return await self.update_schedule_shards(schedule)
+
+    async def get_schedule_hashes(self) -> Optional[Dict[str, Dict[str, str]]]:
+        """Хэши корзин (дата, группа) текущего расписания из манифеста (None - манифест не актуален)"""
+        if self._shards_synced is not True:
+            return None
+        manifest = await self.get_schedule_manifest()
+        return manifest.get('groups') if manifest else None
+
+    async def get_schedule_manifest(self) -> Optional[Dict[str, Any]]:
+        """Манифест шардов: хэши корзин (дата, группа) и преподавателей"""
+        try:
+            entry = await self._read_through(CACHE_MANIFEST, self.schedule_collection.document('manifest'))
+            return entry.data if entry else None
+        except Exception as e:
+            logger.error(f"Ошибка при получении манифеста расписания: {e}")
+            return None
+
+    async def _current_manifest(self) -> Optional[Dict[str, Any]]:
+        """Манифест, если шарды записаны для текущей версии расписания (None - читать полное расписание)"""
+        if self._shards_synced is False:
+            return None
+        manifest, schedule_hash = await asyncio.gather(self.get_schedule_manifest(), self.get_schedule_hash())
+        if not manifest or not schedule_hash or manifest.get('schedule_hash') != schedule_hash:
+            return None
+        return manifest
+
+    async def get_group_schedule(self, group: str) -> Optional[Dict[str, List[Dict]]]:
+        """Пары группы по датам из шардов (None - шарды не записаны или отстали от расписания)"""
+        try:
+            manifest = await self._current_manifest()
+            if not manifest:
+                return None
+            dates = [date for date, groups in manifest.get('groups', {}).items() if group in groups]
+            docs = await self.get_many([self.group_shards_collection.document(shard_id(date, group)) for date in dates])
+            schedule = {}
+            for date in dates:
+                doc = docs.get(shard_id(date, group))
+                if doc is not None and doc.exists:
+                    schedule[date] = doc.to_dict().get('lessons', [])
+            return schedule
+        except Exception as e:
+            logger.error(f"Ошибка при получении расписания группы {group}: {e}")
+            return None
+
+    async def get_teacher_schedule(self, teacher: str) -> Optional[Dict[str, List[Dict]]]:
+        """Пары преподавателя по датам из шарда (None - шарды не записаны или отстали от расписания)"""
+        try:
+            manifest = await self._current_manifest()
+            if not manifest:
+                return None
+            if teacher not in manifest.get('teachers', {}):
+                return {}
+            doc = await self._get(self.teacher_shards_collection.document(shard_id(teacher)))
+            return doc.to_dict().get('days', {}) if doc.exists else {}
+        except Exception as e:
+            logger.error(f"Ошибка при получении расписания преподавателя {teacher}: {e}")
+            return None
+
+    def get_snapshot_stats(self) -> Dict[str, Any]:
+        """Формат хранения расписания, размер снимка и время кодирования/распаковки"""
+        stats = {'format': SCHEDULE_FORMAT}
+        if self._snapshot_stats:
+            stats.update(vars(self._snapshot_stats), ratio=self._snapshot_stats.ratio)
+        entry = self._cache.get(CACHE_SCHEDULE)
+        if entry is not None and isinstance(entry.data, LazySchedule):
+            stats.setdefault('size', entry.data.size)
+            stats.update(
+                decoded_days=f"{entry.data.decoded}/{len(entry.data)}",
+                decode_ms=entry.data.decode_ms
+            )
+        return stats
+
+    def schedule_cached(self) -> bool:
+        """Есть ли актуальная копия полного расписания в памяти"""
+        return self._cache_fresh(self._cache.get(CACHE_SCHEDULE), CACHE_SCHEDULE)
+
+    async def get_compact_schedule(self) -> Optional[CompactSchedule]:
+        """Получение текущего расписания в компактном виде
+
+        Компактная копия перестраивается только при смене версии в кэше,
+        а ее дни строятся по мере обращения к ним.
+        """
+        try:
+            entry = await self._read_through(CACHE_SCHEDULE, self.schedule_collection.document('current'),
+                                             decode=load_schedule)
+            if not entry:
+                logger.warning("Расписание не найдено")
+                return None
+            if self._compact_schedule is None or self._compact_schedule_version != entry.version:
+                self._compact_schedule = CompactSchedule.from_dict(entry.data)
+                self._compact_schedule_version = entry.version
+                logger.info("Построена компактная копия расписания")
+            return self._compact_schedule
+        except Exception as e:
+            logger.error(f"Ошибка при получении расписания: {e}")
+            return None
+
     async def get_groups(self) -> list:
         """Получение списка всех групп"""
         try:
             logger.info("Получение списка всех групп")
-            doc = self.schedule_collection.document('groups').get()
-            if doc.exists:
-                groups = doc.to_dict().get('groups', [])
+            entry = await self._read_through(CACHE_GROUPS, self.schedule_collection.document('groups'))
+            if entry:
+                groups = entry.data.get('groups', [])
                 logger.info(f"Получено {len(groups)} групп")
                 return groups
             logger.warning("Документ с группами не найден")
@@ -156,9 +736,9 @@ class Database:
         """Получение списка всех преподавателей"""
         try:
             logger.info("Получение списка всех преподавателей")
-            doc = self.schedule_collection.document('teachers').get()
-            if doc.exists:
-                teachers = doc.to_dict().get('teachers', [])
+            entry = await self._read_through(CACHE_TEACHERS, self.schedule_collection.document('teachers'))
+            if entry:
+                teachers = entry.data.get('teachers', [])
                 logger.info(f"Получено {len(teachers)} преподавателей")
                 return teachers
             logger.warning("Документ с преподавателями не найден")
@@ -175,14 +755,15 @@ class Database:
             
             # Сохраняем группы
             groups_ref = self.schedule_collection.document('groups')
-            batch.set(groups_ref, {'groups': groups, 'updated_at': firestore.SERVER_TIMESTAMP})
+            batch.set(groups_ref, {'groups': groups, 'updated_at': SERVER_TIMESTAMP})
             
             # Сохраняем преподавателей
             teachers_ref = self.schedule_collection.document('teachers')
-            batch.set(teachers_ref, {'teachers': teachers, 'updated_at': firestore.SERVER_TIMESTAMP})
+            batch.set(teachers_ref, {'teachers': teachers, 'updated_at': SERVER_TIMESTAMP})
             
             # Выполняем транзакцию
-            batch.commit()
+            await self._commit(batch)
+            self.invalidate_cache(CACHE_GROUPS, CACHE_TEACHERS)
             
             logger.info(f"Успешно кэшировано {len(groups)} групп и {len(teachers)} преподавателей")
             return True
@@ -193,9 +774,9 @@ class Database:
         """Получение кэшированного списка групп"""
         try:
             logger.info("Получение кэшированного списка групп")
-            doc = self.schedule_collection.document('groups').get()
-            if doc.exists:
-                groups = doc.to_dict().get('groups', [])
+            entry = await self._read_through(CACHE_GROUPS, self.schedule_collection.document('groups'))
+            if entry:
+                groups = entry.data.get('groups', [])
                 return groups
             logger.warning("Кэшированные группы не найдены")
             return []
@@ -206,9 +787,9 @@ class Database:
         """Получение кэшированного списка преподавателей"""
         try:
             logger.info("Получение кэшированного списка преподавателей")
-            doc = self.schedule_collection.document('teachers').get()
-            if doc.exists:
-                teachers = doc.to_dict().get('teachers', [])
+            entry = await self._read_through(CACHE_TEACHERS, self.schedule_collection.document('teachers'))
+            if entry:
+                teachers = entry.data.get('teachers', [])
                 if not teachers:
                     logger.warning("Список преподавателей пуст")
                 return teachers
@@ -264,7 +845,7 @@ class Database:
         try:
             # Создаем новый документ в соответствующей коллекции
             doc_ref = self.db.collection('schedules').document(collection_name)
-            doc_ref.set(image_data)
+            await self._set(doc_ref, image_data)
             logger.info(f"Сохранено изображение для {collection_name}")
             return True
         except Exception as e:
@@ -275,7 +856,7 @@ class Database:
         """Получение данных изображения расписания"""
         try:
             doc_ref = self.db.collection('schedules').document(collection_name)
-            doc = doc_ref.get()
+            doc = await self._get(doc_ref)
             if doc.exists:
                 return doc.to_dict()
             return None
@@ -286,8 +867,9 @@ class Database:
     async def get_all_users(self) -> list:
         """Получение списка всех пользователей"""
         try:
+            await self._flush_write_behind()
             users = []
-            docs = self.users_collection.stream()
+            docs = await self._stream(self.users_collection)
             for doc in docs:
                 user_data = doc.to_dict()
                 users.append(user_data)
@@ -297,10 +879,114 @@ class Database:
             logger.error(f"Ошибка при получении списка пользователей: {e}")
             return []
 
+    async def get_user_stats(self) -> Dict[str, Any]:
+        """Агрегаты пользователей: всего, с уведомлениями, по ролям и группам"""
+        try:
+            # Отложенные изменения пользователей несут и изменения агрегатов
+            await self._flush_write_behind()
+            doc = await self._get(self.stats_collection.document('users'))
+            data = doc.to_dict() if doc.exists else {}
+            if 'reconciled_at' not in data:
+                # Агрегаты еще ни разу не пересчитывались (или документ создан одними
+                # инкрементами) - без пересчета счетчики считались бы от нуля
+                reconciled = await self.reconcile_user_stats()
+                if reconciled is not None:
+                    return reconciled
+            stats = empty_stats()
+            stats.update(data)
+            return stats
+        except Exception as e:
+            logger.error(f"Ошибка при получении статистики пользователей: {e}")
+            return empty_stats()
+
+    async def reconcile_user_stats(self) -> Optional[Dict[str, Any]]:
+        """Пересчет агрегатов по всей коллекции пользователей"""
+        try:
+            # Читаем напрямую: при ошибке чтения агрегаты не должны обнулиться
+            await self._flush_write_behind()
+            docs = await self._stream(self.users_collection)
+            stats = {**empty_stats(), **nest_counters(aggregate_users(doc.to_dict() for doc in docs))}
+            # Инкременты, пришедшие во время пересчета, перезаписываются; их поправит следующий пересчет
+            await self._set(self.stats_collection.document('users'),
+                            {**stats, 'reconciled_at': SERVER_TIMESTAMP})
+            logger.info(f"Статистика пользователей пересчитана: всего {stats['total']}")
+            return stats
+        except Exception as e:
+            logger.error(f"Ошибка при пересчете статистики пользователей: {e}")
+            return None
+
+    async def reconcile_subscriptions(self) -> Optional[Dict[str, int]]:
+        """Построение индекса подписок заново по всей коллекции пользователей"""
+        try:
+            await self._flush_write_behind()
+            docs, existing = await asyncio.gather(
+                self._stream(self.users_collection),
+                self._stream(self.subscriptions_collection)
+            )
+            index = build_subscriptions((int(doc.id), doc.to_dict()) for doc in docs)
+
+            operations = []
+            for key, user_ids in index.items():
+                operations.append((self.subscriptions_collection.document(subscription_document_id(key)),
+                                   {'kind': key[0], 'target': key[1], 'user_ids': user_ids}, False))
+            current_ids = {subscription_document_id(key) for key in index}
+            operations.extend((self.subscriptions_collection.document(doc.id), None, False)
+                              for doc in existing if doc.id not in current_ids)
+            counts = {
+                'groups': sum(1 for kind, _ in index if kind == GROUP),
+                'teachers': sum(1 for kind, _ in index if kind == TEACHER),
+                'users': sum(len(user_ids) for user_ids in index.values())
+            }
+            # Отметка о построении пишется последней: без нее индекс считается неготовым
+            operations.append((self.stats_collection.document('subscriptions'),
+                               {**counts, 'reconciled_at': SERVER_TIMESTAMP}, False))
+            await self._commit_in_batches(operations)
+            logger.info(f"Индекс подписок пересчитан: {counts}")
+            return counts
+        except Exception as e:
+            logger.error(f"Ошибка при пересчете индекса подписок: {e}")
+            return None
+
+    async def get_subscribers(self, keys: List[tuple]) -> Optional[Dict[tuple, List[int]]]:
+        """user_id подписчиков каждой группы и преподавателя (None - индекс недоступен)"""
+        try:
+            # Отложенные изменения пользователей несут и изменения индекса
+            await self._flush_write_behind()
+            marker = await self._get(self.stats_collection.document('subscriptions'))
+            if not marker.exists and await self.reconcile_subscriptions() is None:
+                return None
+            ids = {key: subscription_document_id(key) for key in keys}
+            docs = await self.get_many([self.subscriptions_collection.document(doc_id) for doc_id in ids.values()])
+            subscribers = {}
+            for key, doc_id in ids.items():
+                doc = docs.get(doc_id)
+                subscribers[key] = list(doc.to_dict().get('user_ids', [])) if doc is not None and doc.exists else []
+            return subscribers
+        except Exception as e:
+            logger.error(f"Ошибка при чтении индекса подписок: {e}")
+            return None
+
+    async def get_subscribed_users(self, keys: List[tuple]) -> Optional[Dict[tuple, List[Dict]]]:
+        """Профили подписчиков каждой группы и преподавателя (None - индекс недоступен)"""
+        subscribers = await self.get_subscribers(keys)
+        if subscribers is None:
+            return None
+        profiles = await self.get_users(list({user_id for user_ids in subscribers.values() for user_id in user_ids}))
+        result = {}
+        for key, user_ids in subscribers.items():
+            users = []
+            for user_id in user_ids:
+                profile = profiles.get(user_id)
+                # Запись индекса могла отстать от профиля - сверяемся с профилем
+                if profile is not None and subscription_key(profile) == key:
+                    users.append({**profile, 'user_id': user_id})
+            result[key] = users
+        return result
+
     async def get_last_update_time(self) -> str:
         """Получение времени последнего обновления кэша"""
         try:
-            cache_info = self.cache_collection.document('info').get()
+            cache_info = await self._get(self.cache_collection.document('info'))
             if cache_info.exists:
                 last_update = cache_info.get('last_update')
                 if last_update:
@@ -311,21 +997,32 @@ class Database:
             logger.error(f"Ошибка при получении времени обновления: {e}")
             return "Нет данных"
 
-    async def update_cache_time(self):
+    async def update_cache_time(self, schedule_hash: Optional[str] = None):
         """Обновление времени последнего обновления кэша"""
         try:
-            self.cache_collection.document('info').set({
-                'last_update': firestore.SERVER_TIMESTAMP
-            }, merge=True)
+            info = {'last_update': SERVER_TIMESTAMP}
+            if schedule_hash:
+                info['schedule_hash'] = schedule_hash
+            await self._set(self.cache_collection.document('info'), info, merge=True)
+            self.invalidate_cache(CACHE_INFO)
             return True
         except Exception as e:
             logger.error(f"Ошибка при обновлении времени кэша: {e}")
             return False
 
+    async def get_schedule_hash(self) -> Optional[str]:
+        """Получение хэша последнего сохраненного расписания"""
+        try:
+            entry = await self._read_through(CACHE_INFO, self.cache_collection.document('info'))
+            return entry.data.get('schedule_hash') if entry else None
+        except Exception as e:
+            logger.error(f"Ошибка при получении хэша расписания: {e}")
+            return None
+
     async def get_last_checked_dates(self) -> List[str]:
         """Получение списка последних проверенных дат"""
         try:
-            doc = self.cache_collection.document('last_checked_dates').get()
+            doc = await self._get(self.cache_collection.document('last_checked_dates'))
             if doc.exists:
                 return doc.to_dict().get('dates', [])
             return []
@@ -336,7 +1033,7 @@ class Database:
     async def update_last_checked_dates(self, dates: List[str]) -> bool:
         """Обновление списка последних проверенных дат"""
         try:
-            self.cache_collection.document('last_checked_dates').set({
+            await self._set(self.cache_collection.document('last_checked_dates'), {
                 'dates': dates,
                 'updated_at': datetime.now().isoformat()
             })
@@ -348,8 +1045,9 @@ class Database:
     async def get_users_with_notifications(self) -> List[Dict]:
         """Получение списка пользователей с включенными уведомлениями"""
         try:
+            await self._flush_write_behind()
             users = []
-            docs = self.users_collection.where('notifications', '==', True).stream()
+            docs = await self._stream(self.users_collection.where('notifications', '==', True))
             for doc in docs:
                 user_data = doc.to_dict()
                 user_data['user_id'] = int(doc.id)
@@ -1,4 +1,4 @@
-from bot.services.firebase import db
+from bot.services.storage import get_backend
 
 def get_database():
-    return db 
\ No newline at end of file
+    return get_backend()
@@ -0,0 +1,219 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+)
+from bot.config import logger
+
+DELIVERY_WORKERS = 16
+GLOBAL_RATE = 25  # сообщений в секунду на бота (лимит Telegram - около 30)
+PER_CHAT_INTERVAL = 1.0  # не чаще одного сообщения в секунду в один чат
+MAX_ATTEMPTS = 5  # попыток на сообщение при временных ошибках
+BACKOFF_BASE = 1.0  # задержка перед повтором, удваивается с каждой попыткой
+BACKOFF_MAX = 30.0
+
+# Временные ошибки: сеть, 5xx Telegram и истечение времени запроса
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)
+
+
+@dataclass
+class OutgoingMessage:
+    """Сообщение для отправки через DeliveryEngine"""
+    chat_id: int
+    text: str
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+    job_id: Any = None  # ключ задания в очереди уведомлений
+    error: Optional[Exception] = None  # причина, если отправить не удалось
+
+
+@dataclass
+class DeliveryReport:
+    """Итоги одной рассылки"""
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+    failures: List[tuple] = field(default_factory=list, repr=False)
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def latency(self, percentile: float) -> float:
+        """Время от постановки в очередь до отправки (процентиль, секунды)"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'elapsed': round(self.elapsed, 2),
+            'throughput': round(self.throughput, 1),
+            'latency_p50': round(self.latency(0.5), 2),
+            'latency_p95': round(self.latency(0.95), 2)
+        }
+
+
+class RateLimiter:
+    """Общий лимит отправки: не больше rate сообщений в секунду
+
+    pause() останавливает всю отправку, когда Telegram ответил RetryAfter.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next = max(self._next, time.monotonic()) + self.interval
+
+    def pause(self, seconds: float):
+        self._next = max(self._next, time.monotonic() + seconds)
+
+
+class DeliveryEngine:
+    """Параллельная отправка сообщений с учетом лимитов Telegram
+
+    Пул воркеров разбирает очередь, общий лимит ограничивает скорость бота,
+    сообщения в один чат идут не чаще PER_CHAT_INTERVAL. RetryAfter
+    приостанавливает всю отправку на указанное время и возвращает сообщение
+    в очередь, временные ошибки повторяются с экспоненциальной задержкой.
+    """
+
+    def __init__(self, bot: Bot, workers: int = DELIVERY_WORKERS, rate: float = GLOBAL_RATE,
+                 per_chat_interval: float = PER_CHAT_INTERVAL, max_attempts: int = MAX_ATTEMPTS):
+        self.bot = bot
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.per_chat_interval = per_chat_interval
+        self.max_attempts = max_attempts
+        self._chat_next: Dict[int, float] = {}
+        self.last_report: Optional[DeliveryReport] = None
+
+    async def _wait_chat(self, chat_id: int):
+        now = time.monotonic()
+        ready = self._chat_next.get(chat_id, 0.0)
+        # Место занимается до ожидания, чтобы два воркера не отправили в чат одновременно
+        self._chat_next[chat_id] = max(ready, now) + self.per_chat_interval
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+    async def _send(self, message: OutgoingMessage, queue: asyncio.Queue, report: DeliveryReport) -> bool:
+        """Попытка отправки; False - сообщение вернулось в очередь"""
+        await self._wait_chat(message.chat_id)
+        await self.limiter.acquire()
+        message.attempts += 1
+        try:
+            await self.bot.send_message(message.chat_id, message.text, **message.kwargs)
+        except TelegramRetryAfter as e:
+            # Флуд-контроль действует на весь бот: ждут все воркеры, попытка не засчитывается
+            report.rate_limited += 1
+            message.attempts -= 1
+            self.limiter.pause(e.retry_after)
+            logger.warning(f"Telegram просит подождать {e.retry_after} с (чат {message.chat_id})")
+            queue.put_nowait(message)
+            return False
+        except TRANSIENT_ERRORS as e:
+            if message.attempts < self.max_attempts:
+                report.retries += 1
+                delay = min(BACKOFF_BASE * 2 ** (message.attempts - 1), BACKOFF_MAX)
+                logger.warning(f"Повтор отправки в чат {message.chat_id} через {delay:.0f} с: {e}")
+                asyncio.get_running_loop().call_later(delay, queue.put_nowait, message)
+                return False
+            self._fail(message, e, report)
+            return True
+        except Exception as e:
+            # Бот заблокирован, чат не найден, неверная разметка - повтор не поможет
+            self._fail(message, e, report)
+            return True
+        report.sent += 1
+        report.latencies.append(time.monotonic() - message.queued_at)
+        return True
+
+    def _fail(self, message: OutgoingMessage, error: Exception, report: DeliveryReport):
+        message.error = error
+        report.failed += 1
+        report.failures.append((message, error))
+        if isinstance(error, TelegramForbiddenError):
+            logger.info(f"Чат {message.chat_id} недоступен: {error}")
+        else:
+            logger.error(f"Не удалось отправить сообщение в чат {message.chat_id} "
+                         f"после {message.attempts} попыток: {error}")
+
+    async def _worker(self, queue: asyncio.Queue, pending: List[int], done: asyncio.Event,
+                      report: DeliveryReport, on_result: Optional[Callable[[OutgoingMessage], Any]]):
+        while True:
+            message = await queue.get()
+            try:
+                finished = await self._send(message, queue, report)
+            except Exception as e:
+                self._fail(message, e, report)
+                finished = True
+            finally:
+                queue.task_done()
+            # Рассылка закончена, когда у каждого сообщения есть итог
+            if finished:
+                if on_result:
+                    try:
+                        on_result(message)
+                    except Exception as e:
+                        logger.error(f"Ошибка при записи итога отправки в чат {message.chat_id}: {e}")
+                pending[0] -= 1
+                if pending[0] <= 0:
+                    done.set()
+
+    async def deliver(self, messages: Iterable[OutgoingMessage],
+                      on_result: Optional[Callable[[OutgoingMessage], Any]] = None) -> DeliveryReport:
+        """Отправка всех сообщений; возвращает итоги рассылки
+
+        on_result вызывается для каждого сообщения сразу после итоговой
+        попытки (message.error пуст, если сообщение отправлено).
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        report = DeliveryReport()
+        for message in messages:
+            queue.put_nowait(message)
+        report.total = queue.qsize()
+        if not report.total:
+            return report
+
+        # Повторы возвращаются в очередь с задержкой, поэтому queue.join() не подходит:
+        # ждем, пока число сообщений с итогом не сравняется с общим
+        pending = [report.total]
+        done = asyncio.Event()
+        start = time.monotonic()
+        workers = [
+            asyncio.create_task(self._worker(queue, pending, done, report, on_result))
+            for _ in range(min(self.workers, report.total))
+        ]
+        try:
+            await done.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        report.elapsed = time.monotonic() - start
+        now = time.monotonic()
+        self._chat_next = {chat_id: ready for chat_id, ready in self._chat_next.items() if ready > now}
+        self.last_report = report
+        logger.info(f"Рассылка завершена: {report.summary()}")
+        return report
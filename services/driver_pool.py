@@ -0,0 +1,239 @@
+import queue
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from bot.config import logger
+
+CHROME_BINARY = "/app/.chrome-for-testing/chrome-linux64/chrome"
+CHROMEDRIVER_PATH = "/app/.chrome-for-testing/chromedriver-linux64/chromedriver"
+
+# Ресурсы, которые не нужны для чтения таблицы
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico",
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"
+]
+
+
+class _PooledDriver:
+    __slots__ = ('driver', 'uses', 'created_at', 'last_used')
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = self.last_used = time.monotonic()
+
+
+class ChromeDriverPool:
+    """Пул прогретых браузеров Chrome для парсера"""
+
+    def __init__(self, size: int = 1, max_uses: int = 20, max_rss_mb: int = 700,
+                 page_load_timeout: int = 30, idle_minutes: int = 10):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.page_load_timeout = page_load_timeout
+        # Браузер нужен только запасному разбору, поэтому простаивающий закрываем
+        self.idle_timeout = idle_minutes * 60
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._busy: Dict[int, _PooledDriver] = {}
+        self._created = 0
+        self._lock = Lock()
+        self.stats = {'created': 0, 'recycled': 0, 'acquired': 0, 'idle_closed': 0}
+
+    def _build_options(self) -> Options:
+        """Настройка опций Chrome"""
+        chrome_options = Options()
+        chrome_options.binary_location = CHROME_BINARY
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2
+        })
+        return chrome_options
+
+    def _create(self) -> _PooledDriver:
+        """Запуск нового браузера"""
+        driver = webdriver.Chrome(
+            service=Service(executable_path=CHROMEDRIVER_PATH),
+            options=self._build_options()
+        )
+        driver.set_page_load_timeout(self.page_load_timeout)
+        try:
+            # Блокируем картинки, шрифты и стили на уровне сети
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+        except Exception as e:
+            logger.warning(f"Не удалось включить блокировку ресурсов: {e}")
+        self.stats['created'] += 1
+        logger.info("Запущен новый браузер Chrome для пула")
+        return _PooledDriver(driver)
+
+    def _destroy(self, entry: _PooledDriver):
+        """Закрытие браузера и освобождение слота"""
+        try:
+            entry.driver.quit()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии браузера: {e}")
+        with self._lock:
+            self._created -= 1
+        self.stats['recycled'] += 1
+
+    def _is_healthy(self, entry: _PooledDriver) -> bool:
+        """Проверка, что браузер отвечает"""
+        try:
+            return entry.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _rss_mb(self, entry: _PooledDriver) -> float:
+        """Память, занимаемая chromedriver и всеми процессами Chrome"""
+        try:
+            process = psutil.Process(entry.driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / 1024 / 1024
+        except (psutil.Error, AttributeError):
+            return 0.0
+
+    def acquire(self, timeout: float = 60) -> webdriver.Chrome:
+        """Получение браузера из пула"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                entry = None
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        entry = self._create()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Нет свободных браузеров в пуле")
+                    try:
+                        entry = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        raise TimeoutError("Нет свободных браузеров в пуле")
+
+            if not self._is_healthy(entry):
+                logger.warning("Браузер из пула не отвечает, перезапускаем")
+                self._destroy(entry)
+                continue
+
+            with self._lock:
+                self._busy[id(entry.driver)] = entry
+            self.stats['acquired'] += 1
+            return entry.driver
+
+    def release(self, driver: webdriver.Chrome, broken: bool = False):
+        """Возврат браузера в пул"""
+        with self._lock:
+            entry = self._busy.pop(id(driver), None)
+        if entry is None:
+            return
+
+        entry.uses += 1
+        if broken or entry.uses >= self.max_uses:
+            self._destroy(entry)
+            return
+
+        rss = self._rss_mb(entry)
+        if rss > self.max_rss_mb:
+            logger.info(f"Браузер занимает {rss:.0f} MB, перезапускаем")
+            self._destroy(entry)
+            return
+
+        try:
+            driver.get("about:blank")
+        except Exception:
+            self._destroy(entry)
+            return
+        entry.last_used = time.monotonic()
+        self._idle.put(entry)
+
+    @contextmanager
+    def driver(self, timeout: float = 60):
+        """Контекстный менеджер для работы с браузером из пула"""
+        driver = self.acquire(timeout)
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken=broken)
+
+    def warm_up(self):
+        """Предварительный запуск браузеров"""
+        drivers = []
+        try:
+            for _ in range(self.size):
+                drivers.append(self.acquire())
+        finally:
+            for driver in drivers:
+                self.release(driver)
+
+    def close_idle(self) -> int:
+        """Закрытие браузеров, не использованных дольше idle_timeout; возвращает их число"""
+        threshold = time.monotonic() - self.idle_timeout
+        fresh, stale = [], []
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            (stale if entry.last_used < threshold else fresh).append(entry)
+        # Очередь LIFO: возвращаем в обратном порядке, чтобы сохранить очередность
+        for entry in reversed(fresh):
+            self._idle.put(entry)
+        for entry in stale:
+            self._destroy(entry)
+        if stale:
+            self.stats['idle_closed'] += len(stale)
+            logger.info(f"Закрыто простаивающих браузеров: {len(stale)}")
+        return len(stale)
+
+    def shutdown(self):
+        """Закрытие всех браузеров пула"""
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(entry)
+        with self._lock:
+            busy = list(self._busy.values())
+            self._busy.clear()
+        for entry in busy:
+            self._destroy(entry)
+        logger.info("Пул браузеров остановлен")
+
+    def get_stats(self) -> Dict:
+        """Статистика пула"""
+        return {
+            **self.stats,
+            'alive': self._created,
+            'idle': self._idle.qsize(),
+            'busy': len(self._busy)
+        }
+
+
+# Создаем глобальный пул браузеров
+driver_pool = ChromeDriverPool()
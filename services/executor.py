@@ -0,0 +1,58 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from typing import Any, Callable, Optional
+from bot.config import logger
+
+
+class OperationCancelled(Exception):
+    """Операция отменена по токену или по истечении времени"""
+
+
+class CancelToken:
+    """Флаг отмены, который проверяет блокирующий код в потоке"""
+
+    def __init__(self):
+        self._event = Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled("Операция отменена")
+
+
+class BlockingExecutor:
+    """Выполнение блокирующего кода вне цикла событий"""
+
+    def __init__(self, name: str, max_workers: int = 1):
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None,
+                  token: Optional[CancelToken] = None, **kwargs) -> Any:
+        """Запуск функции в пуле потоков с ожиданием результата"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            # Сообщаем потоку, что результат больше не нужен
+            if token:
+                token.cancel()
+            logger.error(f"[{self.name}] Превышено время выполнения {timeout} с")
+            raise
+        except asyncio.CancelledError:
+            if token:
+                token.cancel()
+            raise
+
+    def shutdown(self):
+        """Остановка пула без ожидания незавершенных задач"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
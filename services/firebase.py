@@ -29,5 +29,19 @@ def initialize_firebase():
         logger.error(f"Ошибка при инициализации Firebase: {e}")
         raise
 
-# Initialize Firebase and get database instance
-db = initialize_firebase()
\ No newline at end of file
+_client = None
+
+
+def get_client():
+    """Клиент Firestore; Firebase инициализируется при первом обращении"""
+    global _client
+    if _client is None:
+        _client = initialize_firebase()
+    return _client
+
+
+def __getattr__(name):
+    # firebase.db по-прежнему доступен, но не инициализирует Firebase при импорте модуля
+    if name == 'db':
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
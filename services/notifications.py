@@ -1,78 +1,184 @@
+import asyncio
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Set
 from aiogram import Bot
 from bot.config import config, logger
 from bot.services.database import Database
+from bot.services.delivery import DeliveryEngine, OutgoingMessage
+from bot.services.outbox import PENDING, outbox
 from bot.middlewares.schedule_formatter import ScheduleFormatter
+from bot.utils.schedule_diff import LessonChange, ScheduleDiff
+from bot.utils.schedule_model import CompactSchedule
+from bot.utils.subscriptions import GROUP, TEACHER, SubscriptionKey, subscription_key
+from bot.utils.user_stats import STUDENT_ROLE
 
 class NotificationManager:
     def __init__(self, bot: Bot):
         self.bot = bot
         self.db = Database()
         self.formatter = ScheduleFormatter()
+        self.delivery = DeliveryEngine(bot)
+        self.outbox = outbox
+        # Фоновые рассылки очереди; flush очереди выполняется под ее собственной блокировкой
+        self._sending: Set[asyncio.Task] = set()
 
-    async def check_and_send_notifications(self):
-        """Проверка новых дней в расписании и отправка уведомлений"""
+    async def notify_changes(self, diff: ScheduleDiff):
+        """Уведомления по изменениям между двумя последовательными версиями расписания
+
+        Новые дни приходят подписчикам целиком, изменения внутри уже
+        известных дней - кратким списком того, что поменялось. Уведомления
+        получают только подписчики групп и преподавателей, чьи пары затронуты.
+        """
         try:
-            # Получаем текущее расписание
-            schedule_data = await self.db.get_schedule()
-            if not schedule_data:
+            # Только что записанная версия уже лежит в кэше
+            schedule = await self.db.get_compact_schedule()
+            if not schedule:
                 return
 
-            # Получаем последнюю проверенную дату
-            last_checked_dates = await self.db.get_last_checked_dates()
-            
-            # Находим новые дни
-            new_dates = set(schedule_data.keys()) - set(last_checked_dates)
-            if not new_dates:
+            # Новые дни, о которых еще не сообщали. Сравниваются все дни расписания, а не
+            # только добавленные в diff: если прошлая рассылка прервалась до сохранения
+            # проверенных дат, эти дни будут разосланы снова
+            last_checked_dates = set(await self.db.get_last_checked_dates())
+            new_dates = [date for date in schedule.dates if date not in last_checked_dates]
+            if diff.is_empty and not new_dates:
                 return
-
-            # Получаем пользователей с включенными уведомлениями
-            users = await self.db.get_users_with_notifications()
-            if not users:
+            if diff.is_empty and not last_checked_dates:
+                # Первый запуск: прерванной рассылки не было, текущие дни считаются известными
+                await self.db.update_last_checked_dates(schedule.dates)
                 return
 
-            # Отправляем уведомления
-            for user in users:
-                try:
-                    user_schedule = {}
-                    for date in new_dates:
-                        if user['role'] == 'Студент':
-                            group = user.get('selected_group')
-                            if group and group in schedule_data[date]:
-                                user_schedule[date] = schedule_data[date][group]
-                        else:  # Преподаватель
-                            teacher = user.get('selected_teacher')
-                            if teacher:
-                                lessons = []
-                                for group_schedule in schedule_data[date].values():
-                                    for lesson in group_schedule:
-                                        if lesson.get('teacher') == teacher:
-                                            lessons.append(lesson)
-                                if lessons:
-                                    user_schedule[date] = lessons
-
-                    if user_schedule:
-                        # Форматируем расписание для каждого нового дня
-                        for date in user_schedule:
-                            formatted_schedule = self.formatter.format_schedule(
-                                user_schedule[date],
-                                date,
-                                user
-                            )
-                            await self.bot.send_message(
-                                user['user_id'],
-                                f"🔔 Доступно новое расписание!\n\n{formatted_schedule}",
-                                parse_mode="Markdown"
-                            )
-                            logger.info(f"Уведомление отправлено пользователю {user['user_id']}")
-
-                except Exception as e:
-                    logger.error(f"Ошибка при отправке уведомления пользователю {user['user_id']}: {e}")
+            # Изменения внутри известных дней: цель подписки -> дата -> изменения.
+            # Пропавшие с сайта дни просто ушли из окна расписания - об отмене пар не сообщаем
+            changes: Dict[SubscriptionKey, Dict[str, List[LessonChange]]] = {}
+            skipped = set(diff.added_dates) | set(new_dates) | set(diff.removed_dates)
+            for date, groups in diff.groups.items():
+                if date in skipped:
                     continue
+                for group, group_changes in groups.items():
+                    changes.setdefault((GROUP, group), {})[date] = group_changes
+            for teacher, days in diff.teachers.items():
+                for date, teacher_changes in days.items():
+                    if date not in skipped:
+                        changes.setdefault((TEACHER, teacher), {})[date] = teacher_changes
+
+            targets = set(changes)
+            for date in new_dates:
+                targets.update((GROUP, group) for group in schedule.day(date))
+                targets.update((TEACHER, teacher) for teacher in schedule.teachers_on(date))
+
+            # Тексты форматируются один раз на цель подписки и рассылаются всем ее подписчикам
+            payloads = {}
+            for key in targets:
+                texts = [self.render_payload(key, date, schedule) for date in new_dates]
+                texts.extend(self.render_changes(key, date, items) for date, items in changes.get(key, {}).items())
+                payloads[key] = [text for text in texts if text]
+            payloads = {key: texts for key, texts in payloads.items() if texts}
+
+            messages = []
+            for key, users in (await self.get_subscribers(list(payloads))).items():
+                for user in users:
+                    messages.extend(
+                        OutgoingMessage(user['user_id'], text, {'parse_mode': "Markdown"})
+                        for text in payloads[key]
+                    )
+
+            # Задания сохраняются до отправки: повторный расчет той же версии расписания
+            # не создаст дублей, а прерванная рассылка продолжится после перезапуска
+            version = await self.db.get_schedule_hash() or ''
+            queued = self.outbox.enqueue(messages, version)
+            logger.info(
+                f"Изменено целей подписки: {len(changes)}, новых дней: {len(new_dates)}, "
+                f"подготовлено уведомлений: {len(messages)}, новых в очереди: {queued}"
+            )
+
+            if new_dates:
+                await self.db.update_last_checked_dates(schedule.dates)
+
+            # Рассылка тысяч сообщений идет минуты: не держим на ней обновление расписания
+            self.start_sending()
+
+        except Exception as e:
+            logger.error(f"Ошибка при отправке уведомлений об изменениях: {e}")
+
+    async def send_pending(self):
+        """Отправка всех неотправленных заданий из очереди уведомлений"""
+        try:
+            report = await self.outbox.flush(self.delivery)
+            if report:
+                logger.info(f"Уведомления отправлены: {report.sent} из {report.total}, ошибок: {report.failed}")
+        except Exception as e:
+            logger.error(f"Ошибка при отправке уведомлений из очереди: {e}")
+
+    def start_sending(self) -> asyncio.Task:
+        """Запуск отправки очереди в фоне"""
+        task = asyncio.create_task(self.send_pending())
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+        return task
 
-            # Обновляем последние проверенные даты
-            await self.db.update_last_checked_dates(list(schedule_data.keys()))
-            
+    async def stop_sending(self):
+        """Остановка фоновых рассылок: неотправленные задания останутся в очереди до запуска"""
+        tasks = list(self._sending)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def resume(self):
+        """Продолжение рассылки, прерванной перезапуском бота
+
+        Досылаются задания из очереди и новые дни, которые не успели
+        отметить проверенными.
+        """
+        try:
+            stats = self.outbox.get_stats()
+            if stats[PENDING]:
+                logger.info(f"Неотправленных уведомлений в очереди: {stats[PENDING]}")
+                self.start_sending()
         except Exception as e:
-            logger.error(f"Ошибка при проверке и отправке уведомлений: {e}") 
\ No newline at end of file
+            logger.error(f"Ошибка при чтении очереди уведомлений: {e}")
+        await self.notify_changes(ScheduleDiff())
+
+    @staticmethod
+    def _target_profile(key: SubscriptionKey) -> Dict:
+        """Профиль для форматтера: ему важны только роль и выбранная группа/преподаватель"""
+        kind, target = key
+        if kind == GROUP:
+            return {'role': STUDENT_ROLE, 'selected_group': target}
+        return {'role': 'Преподаватель', 'selected_teacher': target}
+
+    def render_payload(self, key: SubscriptionKey, date: str, schedule: CompactSchedule) -> Optional[str]:
+        """Текст уведомления для группы или преподавателя на дату (None - пар нет)"""
+        kind, target = key
+        if kind == GROUP:
+            lessons = schedule.group_lessons(date, target)
+        else:
+            # Пары преподавателя берутся из индекса, с группой в каждой паре
+            lessons = schedule.teacher_lessons(date, target)
+        if not lessons:
+            return None
+        formatted_schedule = self.formatter.format_schedule(lessons, date, self._target_profile(key))
+        return f"🔔 Доступно новое расписание!\n\n{formatted_schedule}"
+
+    def render_changes(self, key: SubscriptionKey, date: str, changes: List[LessonChange]) -> Optional[str]:
+        """Текст об изменениях пар группы или преподавателя на дату"""
+        if not changes:
+            return None
+        return self.formatter.format_changes(changes, date, self._target_profile(key))
+
+    async def get_subscribers(self, keys: List[SubscriptionKey]) -> Dict[SubscriptionKey, List[Dict]]:
+        """Подписчики каждой группы и преподавателя"""
+        if not keys:
+            return {}
+        subscribed = await self.db.get_subscribed_users(keys)
+        if subscribed is not None:
+            return subscribed
+
+        # Индекс недоступен - разбираем всех пользователей с уведомлениями
+        logger.warning("Индекс подписок недоступен, поиск по всем пользователям с уведомлениями")
+        wanted = set(keys)
+        subscribed = {key: [] for key in keys}
+        for user in await self.db.get_users_with_notifications():
+            key = subscription_key(user)
+            if key in wanted:
+                subscribed[key].append(user)
+        return subscribed
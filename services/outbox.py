@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bot.config import logger
+from bot.services.delivery import DeliveryEngine, DeliveryReport, OutgoingMessage
+
+# Локальная очередь уведомлений: переживает перезапуск независимо от основного хранилища
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', os.path.join('data', 'outbox.sqlite3'))
+RETENTION_DAYS = 7  # сколько хранить отправленные и отброшенные задания для дедупликации
+MAX_AGE_HOURS = 24  # неотправленное за это время расписание уже неактуально
+
+PENDING = 'pending'
+SENT = 'sent'
+DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    user_id INTEGER NOT NULL,
+    payload_hash TEXT NOT NULL,
+    version TEXT NOT NULL,
+    text TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, payload_hash, version)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+"""
+
+# Задание: (пользователь, хэш текста, версия расписания)
+JobKey = Tuple[int, str, str]
+
+
+def payload_hash(text: str, options: Dict[str, Any]) -> str:
+    """Хэш содержимого сообщения вместе с параметрами отправки"""
+    normalized = json.dumps([text, options], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class NotificationOutbox:
+    """Очередь уведомлений в локальном SQLite
+
+    Задание с тем же пользователем, текстом и версией расписания ставится
+    один раз, поэтому повторная рассылка после перезапуска не дублирует уже
+    отправленное. Задание отмечается отправленным сразу после отправки:
+    при падении посреди рассылки повторно уйдут только неотмеченные
+    (доставка не менее одного раза). Сообщения, которые не удалось
+    отправить, остаются в списке отброшенных с текстом ошибки.
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH, retention_days: int = RETENTION_DAYS,
+                 max_age_hours: int = MAX_AGE_HOURS):
+        self.path = path
+        self.retention = timedelta(days=retention_days)
+        self.max_age = timedelta(hours=max_age_hours)
+        self.conn: Optional[sqlite3.Connection] = None
+        # Одна рассылка за раз, иначе два вызова flush отправят одни и те же задания
+        self._lock = asyncio.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            if self.path != ':memory:':
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, isolation_level=None)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+        return self.conn
+
+    def enqueue(self, messages: Iterable[OutgoingMessage], version: str) -> int:
+        """Постановка сообщений в очередь; возвращает число новых заданий"""
+        now = datetime.now().isoformat()
+        rows = [
+            (message.chat_id, payload_hash(message.text, message.kwargs), version,
+             message.text, json.dumps(message.kwargs, ensure_ascii=False), now, now)
+            for message in messages
+        ]
+        if not rows:
+            return 0
+        conn = self._connect()
+        before = conn.total_changes
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (user_id, payload_hash, version, text, options, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        added = conn.total_changes - before
+        if added < len(rows):
+            logger.info(f"Пропущено уже поставленных в очередь уведомлений: {len(rows) - added}")
+        return added
+
+    def pending(self) -> List[OutgoingMessage]:
+        """Неотправленные задания в порядке постановки"""
+        cursor = self._connect().execute(
+            "SELECT user_id, payload_hash, version, text, options FROM jobs "
+            "WHERE status = ? ORDER BY created_at, rowid",
+            (PENDING,)
+        )
+        return [
+            OutgoingMessage(user_id, text, json.loads(options), job_id=(user_id, digest, version))
+            for user_id, digest, version, text, options in cursor
+        ]
+
+    def _mark(self, message: OutgoingMessage):
+        """Итог отправки задания, записывается сразу после попытки"""
+        if message.job_id is None:
+            return
+        status, error = (DEAD, str(message.error)) if message.error else (SENT, None)
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, attempts = attempts + ?, updated_at = ? "
+            "WHERE user_id = ? AND payload_hash = ? AND version = ?",
+            (status, error, message.attempts, datetime.now().isoformat(), *message.job_id)
+        )
+
+    def _expire(self):
+        """Устаревшие неотправленные задания - в отброшенные, старые итоги - удаляются"""
+        now = datetime.now()
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            expired = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ? AND created_at < ?",
+                (DEAD, 'устарело', now.isoformat(), PENDING, (now - self.max_age).isoformat())
+            ).rowcount
+            conn.execute(
+                "DELETE FROM jobs WHERE status != ? AND updated_at < ?",
+                (PENDING, (now - self.retention).isoformat())
+            )
+        if expired:
+            logger.warning(f"Отброшено устаревших уведомлений: {expired}")
+
+    async def flush(self, engine: DeliveryEngine) -> Optional[DeliveryReport]:
+        """Отправка всех неотправленных заданий через engine"""
+        async with self._lock:
+            self._expire()
+            messages = self.pending()
+            if not messages:
+                return None
+            return await engine.deliver(messages, on_result=self._mark)
+
+    def dead_letters(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Последние отброшенные задания с причиной"""
+        cursor = self._connect().execute(
+            "SELECT user_id, version, error, attempts, updated_at FROM jobs "
+            "WHERE status = ? ORDER BY updated_at DESC LIMIT ?",
+            (DEAD, limit)
+        )
+        columns = ('user_id', 'version', 'error', 'attempts', 'updated_at')
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def requeue_dead(self) -> int:
+        """Возврат отброшенных заданий в очередь; возвращает их число"""
+        now = datetime.now().isoformat()
+        return self._connect().execute(
+            "UPDATE jobs SET status = ?, error = NULL, created_at = ?, updated_at = ? WHERE status = ?",
+            (PENDING, now, now, DEAD)
+        ).rowcount
+
+    def get_stats(self) -> Dict[str, int]:
+        """Число заданий в каждом состоянии"""
+        stats = {PENDING: 0, SENT: 0, DEAD: 0}
+        stats.update(self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return stats
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+outbox = NotificationOutbox()
@@ -1,26 +1,95 @@
 import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
 from datetime import datetime
 from bot.services.database import Database
+from bot.services.driver_pool import driver_pool
+from bot.services.executor import BlockingExecutor, CancelToken
 from bot.config import logger, WEEKDAYS, format_date
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import os
 import time
 from threading import Lock
-from webdriver_manager.chrome import ChromeDriverManager
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Tuple, Union
 import locale
 from bot.utils.date_helpers import format_russian_date, parse_russian_date
+from bot.utils.schedule_hash import content_hash
+from bot.utils.schedule_table import assemble_schedule, extract_lesson_data_soup, iter_lessons
+from bot.utils.page_recorder import PageRecorder
+from bot.utils.schedule_model import Lesson
+from bot.utils.schedule_calendar import CalendarIndex
 
 user_lock = Lock()
 
+
+def _cancellable(records, token: CancelToken):
+    """Строки таблиц с проверкой отмены: разбор, переживший таймаут, не занимает поток парсера"""
+    for record in records:
+        token.raise_if_cancelled()
+        yield record
+
+# Один поток: параллельные запуски парсинга выполняются по очереди
+parse_executor = BlockingExecutor("parser", max_workers=1)
+PARSE_TIMEOUT = 180  # секунд на весь парсинг
+
+HTTP_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+
+# Разметка всех таблиц страницы; для таблиц DataTables берутся все строки
+# (со всех страниц, в текущем порядке сортировки). Возвращает null,
+# если DataTables на странице не инициализирован, и false, если все строки
+# разом получить нельзя (серверная обработка или неотрисованные строки) -
+# тогда таблица обходится по страницам.
+ALL_ROWS_SCRIPT = """
+var $ = window.jQuery;
+if (!$ || !$.fn.dataTable) { return null; }
+var dt = $.fn.dataTable;
+var missing = function (row) { return !row; };
+var parts = [];
+var tables = document.querySelectorAll('table');
+for (var i = 0; i < tables.length; i++) {
+    var table = tables[i];
+    var isDataTable = dt.isDataTable ? dt.isDataTable(table) : dt.fnIsDataTable(table);
+    if (!isDataTable) { parts.push(table.outerHTML); continue; }
+    var nodes;
+    if ($.fn.DataTable && $(table).DataTable().rows) {
+        // DataTables 1.10+
+        var api = $(table).DataTable();
+        // При серверной обработке в браузере есть только текущая страница
+        if (api.settings()[0].oFeatures.bServerSide) { return false; }
+        nodes = api.rows().nodes().toArray();
+        if (nodes.some(missing)) {
+            // deferRender: узлы строк создаются при отрисовке - рисуем все строки сразу
+            api.page.len(-1).draw(false);
+            nodes = api.rows().nodes().toArray();
+        }
+    } else {
+        // Старый API 1.9
+        var legacy = $(table).dataTable();
+        if (legacy.fnSettings().oFeatures.bServerSide) { return false; }
+        nodes = legacy.fnGetNodes();
+    }
+    if (Array.prototype.some.call(nodes, missing)) { return false; }
+    var head = table.tHead ? table.tHead.outerHTML : '';
+    parts.push('<table>' + head + '<tbody>'
+        + Array.prototype.map.call(nodes, function (row) { return row.outerHTML; }).join('')
+        + '</tbody></table>');
+}
+return parts.join('');
+"""
+
+# Признак ответа 304 Not Modified
+NOT_MODIFIED = object()
+
 class ScheduleParser:
+    _http_session: aiohttp.ClientSession | None = None
+    # Состояние условной загрузки, общее для всех экземпляров парсера
+    _fetch_state = {'etag': None, 'last_modified': None, 'content_hash': None, 'loaded': False}
+    _pending_state = {}
+
     def __init__(self):
         self.url = "https://bartc.by/index.php/obuchayushchemusya/dnevnoe-otdelenie/tekushchee-raspisanie"
         self.db = Database()
@@ -39,33 +108,88 @@ class ScheduleParser:
             'май': '05', 'июн': '06', 'июл': '07', 'авг': '08',
             'сен': '09', 'окт': '10', 'ноя': '11', 'дек': '12'
         }
-        
-        # Настройка Chrome options
-        self.chrome_options = Options()
-        self.chrome_options.binary_location = "/app/.chrome-for-testing/chrome-linux64/chrome"
-        self.chrome_options.add_argument("--headless=new")
-        self.chrome_options.add_argument("--disable-dev-shm-usage")
-        self.chrome_options.add_argument("--no-sandbox")
-        self.chrome_options.add_argument("--disable-gpu")
-        self.chrome_options.add_argument("--remote-debugging-port=9222")
-        
-        # Настройка Service с явным путем к chromedriver
-        self.service = Service(
-            executable_path="/app/.chrome-for-testing/chromedriver-linux64/chromedriver"
-        )
 
-    async def parse_schedule(self) -> tuple:
-        """Парсинг расписания"""
-        driver = None
-        try:
-            logger.info("Начало парсинга расписания")
-            
-            driver = webdriver.Chrome(
-                service=self.service,
-                options=self.chrome_options
+        # Режим записи страниц для офлайн-бенчмарков (PARSER_RECORD_DIR)
+        record_dir = os.getenv('PARSER_RECORD_DIR')
+        self.recorder = PageRecorder(record_dir) if record_dir else None
+
+    @classmethod
+    async def _get_http_session(cls) -> aiohttp.ClientSession:
+        """Общая HTTP-сессия для всех экземпляров парсера"""
+        if cls._http_session is None or cls._http_session.closed:
+            cls._http_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=30),
+                headers={'User-Agent': HTTP_USER_AGENT}
             )
-            driver.set_page_load_timeout(30)
-            
+        return cls._http_session
+
+    @classmethod
+    async def close_http_session(cls):
+        """Закрытие общей HTTP-сессии"""
+        if cls._http_session is not None and not cls._http_session.closed:
+            await cls._http_session.close()
+        cls._http_session = None
+
+    async def _fetch_html(self, conditional: bool = False) -> str | object | None:
+        """Загрузка страницы расписания без браузера
+
+        При conditional=True отправляет сохраненные ETag/Last-Modified
+        и возвращает NOT_MODIFIED, если страница не менялась.
+        """
+        state = ScheduleParser._fetch_state
+        headers = {}
+        if conditional:
+            if state['etag']:
+                headers['If-None-Match'] = state['etag']
+            if state['last_modified']:
+                headers['If-Modified-Since'] = state['last_modified']
+
+        try:
+            session = await self._get_http_session()
+            async with session.get(self.url, headers=headers) as response:
+                if response.status == 304:
+                    return NOT_MODIFIED
+                if response.status != 200:
+                    logger.warning(f"HTTP-загрузка расписания вернула статус {response.status}")
+                    return None
+                html = await response.text()
+                ScheduleParser._pending_state.update({
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                })
+                return html
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Не удалось загрузить расписание по HTTP: {e}")
+            return None
+
+    def _parse_html(self, html: str, schedule_data: dict, group_set: set, teacher_set: set,
+                    token: CancelToken) -> bool:
+        """Разбор таблиц расписания из HTML страницы"""
+        return assemble_schedule(_cancellable(iter_lessons(html), token), schedule_data, group_set, teacher_set) > 0
+
+    def _record_page(self, html: str, source: str):
+        """Сохранение сырой страницы в каталог фикстур (режим записи)"""
+        if not self.recorder:
+            return
+        try:
+            path = self.recorder.record(html, source, url=self.url)
+            logger.info(f"Страница сохранена в фикстуры: {path}")
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить страницу в фикстуры: {e}")
+
+    def _parse_page(self, html: str, token: CancelToken) -> tuple | None:
+        """Разбор одной HTML-страницы (выполняется в пуле потоков)"""
+        self._record_page(html, 'http')
+        token.raise_if_cancelled()
+        schedule_data, group_set, teacher_set = {}, set(), set()
+        if not self._parse_html(html, schedule_data, group_set, teacher_set, token) or not group_set:
+            return None
+        return schedule_data, group_set, teacher_set
+
+    def _parse_with_selenium(self, token: CancelToken) -> tuple | None:
+        """Парсинг расписания через браузер (запасной вариант, выполняется в пуле потоков)"""
+        schedule_data, group_set, teacher_set = {}, set(), set()
+        with driver_pool.driver() as driver:
             driver.get(self.url)
             logger.info("Страница загружена")
 
@@ -74,55 +198,122 @@ class ScheduleParser:
                 EC.presence_of_element_located((By.TAG_NAME, "table"))
             )
 
-            schedule_data = {}
-            group_set = set()
-            teacher_set = set()
-
-            while True:
+            token.raise_if_cancelled()
+
+            # Все строки DataTables забираем одним запросом, без перелистывания
+            html = driver.execute_script(ALL_ROWS_SCRIPT)
+            if html is False:
+                logger.info("Все строки DataTables получить нельзя, обходим таблицу по страницам")
+                if not self._parse_pages(driver, schedule_data, group_set, teacher_set, token):
+                    return None
+                return schedule_data, group_set, teacher_set
+            if html is None:
+                # DataTables на странице нет - таблица уже целиком в разметке
                 html = driver.page_source
-                soup = BeautifulSoup(html, 'html.parser')
-                schedule_tables = soup.find_all('table')
-
-                if not schedule_tables:
-                    return None, None, "❌ Расписание не найдено"
-
-                current_day = ""
-
-                for table in schedule_tables:
-                    rows = table.find_all('tr')
-                    for row in rows:
-                        cells = row.find_all(['td', 'th'])
-                        if not cells:
-                            continue
-
-                        date_cell = cells[0].get_text(strip=True)
-                        if len(date_cell) > 0:
-                            try:
-                                current_day = date_cell.strip('()')
-                                if current_day not in schedule_data:
-                                    schedule_data[current_day] = {}
-
-                                group_cell = row.find('td', class_='ari-tbl-col-1')
-                                if group_cell:
-                                    group = group_cell.get_text(strip=True)
-                                    group_set.add(group)
-
-                                    lesson_data = self._extract_lesson_data(row)
-                                    if lesson_data:
-                                        if group not in schedule_data[current_day]:
-                                            schedule_data[current_day][group] = []
-                                        schedule_data[current_day][group].append(lesson_data)
-                                        
-                                        # Добавляем преподавателя в множество, если он есть
-                                        if lesson_data['teacher']:
-                                            teacher_set.add(lesson_data['teacher'])
-
-                            except ValueError as ve:
-                                logger.warning(f"Ошибка обработки даты: {ve}")
-                                continue
-
-                if not self._go_to_next_page(driver):
-                    break
+            self._record_page(html, 'selenium')
+
+            token.raise_if_cancelled()
+            if not self._parse_html(html, schedule_data, group_set, teacher_set, token):
+                return None
+
+            return schedule_data, group_set, teacher_set
+
+    def _parse_pages(self, driver, schedule_data: dict, group_set: set, teacher_set: set,
+                     token: CancelToken) -> bool:
+        """Разбор таблицы постранично через кнопку "следующая" (запасной путь для DataTables)"""
+        found = False
+        while True:
+            token.raise_if_cancelled()
+            html = driver.page_source
+            self._record_page(html, 'selenium')
+            found = self._parse_html(html, schedule_data, group_set, teacher_set, token) or found
+            if not self._go_to_next_page(driver):
+                return found
+
+    def _go_to_next_page(self, driver) -> bool:
+        """Переход на следующую страницу"""
+        try:
+            next_button = driver.find_element(By.CSS_SELECTOR, "div.dataTables_paginate .fg-button[id$='_next']")
+            if "ui-state-disabled" in next_button.get_attribute("class"):
+                return False
+
+            old_content = driver.find_element(By.TAG_NAME, "table").text
+            driver.execute_script("arguments[0].click();", next_button)
+            WebDriverWait(driver, 10).until(
+                lambda d: d.find_element(By.TAG_NAME, "table").text != old_content
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при переключении страницы: {e}")
+            return False
+
+    async def parse_schedule(self) -> tuple:
+        """Парсинг расписания"""
+        schedule_data, groups_list, teachers_list, error, _ = await self._parse(conditional=False)
+        return schedule_data, groups_list, teachers_list, error
+
+    async def parse_schedule_if_changed(self) -> tuple:
+        """Парсинг расписания только при изменении источника
+
+        Возвращает (schedule_data, groups, teachers, error, changed).
+        Если страница не изменилась (304 или тот же хэш содержимого),
+        changed=False и списки групп и преподавателей в базу не пишутся.
+        """
+        return await self._parse(conditional=True)
+
+    def commit_fetch_state(self) -> str | None:
+        """Фиксация ETag/Last-Modified и хэша после успешного сохранения расписания"""
+        state = ScheduleParser._fetch_state
+        state.update(ScheduleParser._pending_state)
+        ScheduleParser._pending_state = {}
+        return state['content_hash']
+
+    async def _parse(self, conditional: bool) -> tuple:
+        try:
+            logger.info("Начало парсинга расписания")
+
+            state = ScheduleParser._fetch_state
+            ScheduleParser._pending_state = {}
+            if not state['loaded']:
+                state['content_hash'] = await self.db.get_schedule_hash()
+                state['loaded'] = True
+
+            # Сначала пробуем получить таблицу обычным HTTP-запросом,
+            # браузер запускаем только если это не удалось.
+            # Разбор и работа с браузером идут в отдельном потоке,
+            # чтобы не блокировать обработку сообщений
+            token = CancelToken()
+            deadline = time.monotonic() + PARSE_TIMEOUT
+            parsed = None
+            html = await self._fetch_html(conditional)
+            if html is NOT_MODIFIED:
+                logger.info("Страница расписания не изменилась (304)")
+                return None, [], [], None, False
+            if html:
+                parsed = await parse_executor.run(self._parse_page, html, token, timeout=PARSE_TIMEOUT, token=token)
+
+            if parsed:
+                logger.info("Расписание получено по HTTP")
+            else:
+                logger.info("HTTP-загрузка не дала таблицу, используем Selenium")
+                # ETag/Last-Modified страницы без таблицы не фиксируем: иначе следующие
+                # запросы получат 304 на неизменную оболочку и Selenium больше не запустится
+                ScheduleParser._pending_state.update({'etag': None, 'last_modified': None})
+                parsed = await parse_executor.run(
+                    self._parse_with_selenium, token,
+                    timeout=max(deadline - time.monotonic(), 1), token=token
+                )
+                if not parsed:
+                    return None, [], [], "❌ Расписание не найдено", False
+
+            schedule_data, group_set, teacher_set = parsed
+
+            schedule_hash = content_hash(schedule_data)
+            ScheduleParser._pending_state['content_hash'] = schedule_hash
+            if conditional and schedule_hash == state['content_hash']:
+                logger.info("Содержимое расписания не изменилось")
+                self.commit_fetch_state()
+                return None, [], [], None, False
 
             # Сортируем и сохраняем списки
             groups_list = sorted(list(group_set))
@@ -138,76 +329,25 @@ class ScheduleParser:
                     logger.info(f"Списки сохранены в базу: {len(groups_list)} групп и {len(teachers_list)} преподавателей")
                 except Exception as e:
                     logger.error(f"Ошибка сохранения в базу данных: {e}")
-                    return None, [], [], "❌ Ошибка сохранения данных"
+                    return None, [], [], "❌ Ошибка сохранения данных", False
             else:
                 logger.error("Списки групп и преподавателей пусты!")
-                return None, [], [], "❌ Не удалось получить данные"
+                return None, [], [], "❌ Не удалось получить данные", False
 
-            return schedule_data, groups_list, teachers_list, None
+            return schedule_data, groups_list, teachers_list, None, True
+
+        except asyncio.TimeoutError:
+            return None, [], [], "❌ Превышено время ожидания парсинга", False
 
         except Exception as e:
             logger.error(f"Ошибка парсинга: {str(e)}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
-            return None, [], [], f"❌ Ошибка: {str(e)}"
-            
-        finally:
-            if driver:
-                driver.quit()
-                logger.info("Драйвер Chrome закрыт")
+            return None, [], [], f"❌ Ошибка: {str(e)}", False
 
     def _extract_lesson_data(self, row):
-        """Извлечение данных о паре из строки таблицы"""
-        number = row.find('td', class_='ari-tbl-col-2')
-        discipline = row.find('td', class_='ari-tbl-col-3')
-        teacher = row.find('td', class_='ari-tbl-col-4')
-        classroom = row.find('td', class_='ari-tbl-col-5')
-        subgroup = row.find('td', class_='ari-tbl-col-6')
-
-        if any([number, discipline, teacher, classroom]):
-            return {
-                'number': int(number.get_text(strip=True)) if number and number.get_text(strip=True).isdigit() else 0,
-                'discipline': discipline.get_text(strip=True) if discipline else '',
-                'teacher': teacher.get_text(strip=True) if teacher else '',
-                'classroom': classroom.get_text(strip=True) if classroom else '',
-                'subgroup': subgroup.get_text(strip=True) if subgroup else '0',
-                'group': ''  # Добавляем пустое поле для группы
-            }
-        return None
-
-    def _go_to_next_page(self, driver):
-        """Переход на следующую страницу"""
-        try:
-            next_button = driver.find_element(By.CSS_SELECTOR, "div.dataTables_paginate .fg-button[id$='_next']")
-            if "ui-state-disabled" in next_button.get_attribute("class"):
-                return False
-
-            old_content = driver.find_element(By.TAG_NAME, "table").text
-            driver.execute_script("arguments[0].click();", next_button)
-            WebDriverWait(driver, 10).until(
-                lambda d: d.find_element(By.TAG_NAME, "table").text != old_content
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при переключении страницы: {e}")
-            return False
-
-    def _setup_chrome_options(self):
-        """Настройка опций Chrome для Heroku"""
-        chrome_options = Options()
-        
-        # Основные настройки для headless режима
-        chrome_options.add_argument('--headless=new')  # Обновленный синтаксис для headless режима
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--no-sandbox')
-        
-        # Дополнительные настройки для стабильности
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--disable-extensions')
-        chrome_options.add_argument('--disable-software-rasterizer')
-        
-        return chrome_options
+        """Извлечение данных о паре из строки таблицы BeautifulSoup"""
+        return extract_lesson_data_soup(row)
 
     def _parse_date(self, date_str: str) -> datetime:
         """Парсинг даты из различных форматов"""
@@ -226,58 +366,42 @@ class ScheduleParser:
         except Exception as e:
             logger.error(f"Ошибка при обработке даты {date_str}: {e}")
             return None
-    async def get_schedule_for_day(self, day: str, user_data: dict) -> Union[List[Dict], str]:
+    async def _load_user_schedule(self, user_data: dict) -> Tuple[Optional[Dict[str, list]], Optional[CalendarIndex]]:
+        """Пары пользователя по датам и календарь этих дат
+
+        Если полное расписание уже в памяти, срез берется из него; иначе из
+        базы читаются только шарды нужной группы или преподавателя.
+        """
+        is_teacher = user_data.get('role') == 'Преподаватель'
+        target = user_data.get('selected_teacher') if is_teacher else user_data.get('selected_group')
+
+        if not self.db.schedule_cached():
+            if is_teacher:
+                data = await self.db.get_teacher_schedule(target)
+            else:
+                data = await self.db.get_group_schedule(target)
+            if data is not None:
+                return data, CalendarIndex(data)
+
+        # Шардов еще нет или расписание уже в кэше
+        schedule = await self.db.get_compact_schedule()
+        if not schedule:
+            return None, None
+        data = schedule.teacher_schedule(target) if is_teacher else schedule.group_schedule(target)
+        return data, schedule.calendar
+
+    async def get_schedule_for_day(self, day: str, user_data: dict) -> Union[List[Lesson], str]:
         """Получение расписания на конкретный день"""
         try:
-            schedule_data = await self.db.get_schedule()
-            if not schedule_data:
+            schedule, calendar = await self._load_user_schedule(user_data)
+            if schedule is None:
                 return "Расписание не найдено"
 
-            day = day.lower()
             filtered_schedule = []
 
-            for date, lessons in schedule_data.items():
-                try:
-                    if date.lower() == 'дата':
-                        continue
-
-                    # Преобразуем дату формата "26-нояб" в datetime
-                    if isinstance(date, str):
-                        day_num, month = date.split('-')
-                        month_num = self.MONTH_MAP.get(month.lower())
-                        if not month_num:
-                            logger.error(f"Неизвестный месяц: {month}")
-                            continue
-                        current_date = datetime(datetime.now().year, int(month_num), int(day_num))
-
-                    # Получаем день недели
-                    current_day = current_date.strftime('%A').lower()
-                    weekday_mapping = {
-                        'monday': 'понедельник',
-                        'tuesday': 'вторник',
-                        'wednesday': 'среда',
-                        'thursday': 'четверг',
-                        'friday': 'пятница',
-                        'saturday': 'суббота',
-                        'sunday': 'воскресенье'
-                    }
-                    current_day = weekday_mapping.get(current_day)
-                    
-                    if current_day == day:
-                        if user_data.get('role') == 'Преподаватель':
-                            teacher = user_data.get('selected_teacher')
-                            for group_lessons in lessons.values():
-                                for lesson in group_lessons:
-                                    if lesson.get('teacher') == teacher:
-                                        filtered_schedule.append(lesson)
-                        else:
-                            group = user_data.get('selected_group')
-                            if group in lessons:
-                                filtered_schedule.extend(lessons[group])
-
-                except Exception as e:
-                    logger.error(f"Ошибка при обработке дня {date}: {e}")
-                    continue
+            # Даты нужного дня недели берем из календаря
+            for date in calendar.keys_for_weekday(day.lower()):
+                filtered_schedule.extend(schedule.get(date, []))
 
             if filtered_schedule:
                 return sorted(filtered_schedule, key=lambda x: int(x['number']))
@@ -290,58 +414,30 @@ class ScheduleParser:
     async def get_full_schedule(self, user_data: dict) -> dict:
         """Получение полного расписания на неделю"""
         try:
-            schedule_data = await self.db.get_schedule()
-            if not schedule_data:
+            # Для преподавателя пары уже содержат группу, копировать их не нужно
+            key = 'selected_teacher' if user_data.get('role') == 'Преподаватель' else 'selected_group'
+            if not user_data.get(key):
                 return {}
 
-            # Преобразуем даты в нужный формат
+            filtered_schedule, calendar = await self._load_user_schedule(user_data)
+            if not filtered_schedule:
+                return {}
+
+            # Преобразуем даты в нужный формат, дни идут в календарном порядке
             formatted_schedule = {}
-            for date, data in schedule_data.items():
+            for date in sorted(filtered_schedule, key=calendar.sort_key):
+                lessons = filtered_schedule[date]
                 try:
                     if '.' in date:
                         date_obj = datetime.strptime(date, '%d.%m.%Y')
                         new_date = date_obj.strftime('%d-%b').lower()
                     else:
                         new_date = date
-                    formatted_schedule[new_date] = data
+                    formatted_schedule[new_date] = lessons
                 except:
-                    formatted_schedule[date] = data
-
-            # Для преподавателя
-            if user_data.get('role') == 'Преподаватель':
-                teacher = user_data.get('selected_teacher')
-                if not teacher:
-                    return {}
-
-                filtered_schedule = {}
-                for date, groups in formatted_schedule.items():
-                    filtered_schedule[date] = []
-                    for group_name, group_schedule in groups.items():
-                        for lesson in group_schedule:
-                            if lesson.get('teacher') == teacher:
-                                # Копируем урок и добавляем информацию о группе
-                                lesson_with_group = lesson.copy()
-                                lesson_with_group['group'] = group_name
-                                filtered_schedule[date].append(lesson_with_group)
-                    
-                    # Если на этот день нет пар, удаляем дату
-                    if not filtered_schedule[date]:
-                        del filtered_schedule[date]
-                
-                return filtered_schedule
-
-            # Для студента
-            else:
-                group = user_data.get('selected_group')
-                if not group:
-                    return {}
-
-                filtered_schedule = {}
-                for date, groups in formatted_schedule.items():
-                    if group in groups:
-                        filtered_schedule[date] = groups[group]
-                
-                return filtered_schedule
+                    formatted_schedule[date] = lessons
+
+            return formatted_schedule
 
         except Exception as e:
             logger.error(f"Ошибка при получении полного расписания: {e}")
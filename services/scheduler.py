@@ -2,10 +2,13 @@ import locale
 from datetime import datetime
 import asyncio
 import aioschedule as schedule
-from bot.services.parser import ScheduleParser
+from typing import Optional
+from bot.services.parser import ScheduleParser, parse_executor
+from bot.services.driver_pool import driver_pool
 from bot.services.database import Database
 from bot.config import logger
 from bot.services.notifications import NotificationManager
+from bot.utils.schedule_diff import diff_schedules
 
 try:
     locale.setlocale(locale.LC_TIME, 'ru_RU.UTF-8')
@@ -16,23 +19,34 @@ except locale.Error:
         locale.setlocale(locale.LC_ALL, '')
 
 class ScheduleUpdater:
-    def __init__(self):
+    def __init__(self, notifier: NotificationManager = None):
         self.parser = ScheduleParser()
         self.db = Database()
+        self.notifier = notifier
         self.last_update = None
         self.update_count = 0
+        self.skipped_count = 0
         self.error_count = 0
+        self.last_diff = None
+        # Плановое и ручное обновление не должны сравнивать и записывать версии одновременно
+        self._store_lock = asyncio.Lock()
 
     async def get_stats(self):
         return {
             'last_update': self.last_update,
             'update_count': self.update_count,
+            'skipped_count': self.skipped_count,
+            'last_diff': self.last_diff.summary() if self.last_diff else None,
             'error_count': self.error_count
         }
 
     async def update_schedule(self):
         """Обновление расписания"""
         try:
+            # Шарды, не записанные прошлым обновлением, дописываются в любое время,
+            # иначе читатели до утра или все воскресенье получали бы полное расписание
+            await self.db.sync_schedule_shards()
+
             if datetime.now().weekday() == 6:
                 logger.info("Воскресенье: обновление расписания пропущено")
                 return
@@ -43,18 +57,20 @@ class ScheduleUpdater:
                 return
 
             logger.info("Начало планового обновления расписания")
-            schedule_data, groups_list, teachers_list, error = await self.parser.parse_schedule()
+            schedule_data, groups_list, teachers_list, error, changed = await self.parser.parse_schedule_if_changed()
 
             if error:
                 logger.error(f"Ошибка при плановом обновлении: {error}")
                 self.error_count += 1
                 return
 
-            await self.db.update_schedule(schedule_data)
-            await self.db.update_cache_time()
-            
-            self.last_update = datetime.now()
-            self.update_count += 1
+            if not changed:
+                logger.info("Расписание не изменилось, запись в базу пропущена")
+                self.skipped_count += 1
+                return
+
+            if not await self.store_schedule(schedule_data):
+                return
             
             logger.info(f"Плановое обновление завершено. Групп: {len(groups_list)}, Преподавателей: {len(teachers_list)}")
 
@@ -62,19 +78,80 @@ class ScheduleUpdater:
             logger.error(f"Ошибка при плановом обновлении расписания: {e}")
             self.error_count += 1
 
+    async def store_schedule(self, schedule_data: dict) -> bool:
+        """Сохранение новой версии расписания и уведомления о ее изменениях"""
+        async with self._store_lock:
+            return await self._store_schedule(schedule_data)
+
+    async def _store_schedule(self, schedule_data: dict) -> bool:
+        # Сравниваем с предыдущей версией, чтобы знать, что именно изменилось.
+        # Хэши старой версии берутся из манифеста шардов, корзины с тем же хэшем не сравниваются
+        previous, old_hashes = await asyncio.gather(self.db.get_schedule(), self.db.get_schedule_hashes())
+        self.last_diff = diff_schedules(previous, schedule_data, old_hashes=old_hashes)
+        logger.info(f"Изменения расписания: {self.last_diff.summary()}")
+
+        # Хэши новой версии уже посчитаны diff - план шардов их не пересчитывает
+        if not await self.db.update_schedule(schedule_data, hashes=self.last_diff.hashes):
+            self.error_count += 1
+            return False
+        await self.db.update_cache_time(schedule_hash=self.parser.commit_fetch_state())
+
+        self.last_update = datetime.now()
+        self.update_count += 1
+
+        # Уведомляем только подписчиков групп и преподавателей, чьи пары изменились
+        if self.notifier:
+            await self.notifier.notify_changes(self.last_diff)
+        return True
+
+WARM_UP_TIMEOUT = 120  # секунд на запуск браузеров пула
+
+# Обновление расписания с уведомлениями, созданное планировщиком. Ручное обновление
+# использует его же, чтобы рассылка шла через общие лимиты отправки
+_updater: Optional[ScheduleUpdater] = None
+
+def get_updater() -> Optional[ScheduleUpdater]:
+    """Обновление расписания планировщика (None - планировщик еще не запущен)"""
+    return _updater
+
+async def warm_up_browsers():
+    """Запуск браузеров пула до первого обращения, чтобы запасной разбор через Selenium не ждал холодного старта"""
+    try:
+        # В потоке парсера: разбор, начатый во время прогрева, дождется готового браузера
+        await parse_executor.run(driver_pool.warm_up, timeout=WARM_UP_TIMEOUT)
+        logger.info("Браузеры парсера запущены заранее")
+    except Exception as e:
+        logger.warning(f"Не удалось заранее запустить браузеры парсера: {e}")
+
+async def close_idle_browsers():
+    """Закрытие браузеров пула, простаивающих дольше таймаута"""
+    try:
+        # В потоке парсера, чтобы не мешать идущему разбору
+        await parse_executor.run(driver_pool.close_idle, timeout=WARM_UP_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Не удалось закрыть простаивающие браузеры: {e}")
+
 async def start_scheduler(bot):
     """Запуск планировщика"""
-    updater = ScheduleUpdater()
+    global _updater
+    # Уведомления отправляются по изменениям каждой новой версии расписания
+    notifier = NotificationManager(bot)
+    updater = _updater = ScheduleUpdater(notifier)
+    
+    # Рассылка, прерванная перезапуском, продолжается с того места, где остановилась
+    await notifier.resume()
+    await warm_up_browsers()
     
     # Планируем обновление каждые 5 минут
     schedule.every(5).minutes.do(updater.update_schedule)
+    # Прогретый браузер не держим весь срок работы процесса, если он не нужен
+    schedule.every(1).minutes.do(close_idle_browsers)
     
     logger.info("Планировщик обновления расписания запущен")
     
-    notification_manager = NotificationManager(bot)
-    
-    # Добавляем задачу проверки новых дней в расписании
-    schedule.every(5).minutes.do(notification_manager.check_and_send_notifications)
+    # Ночной пересчет агрегатов и индекса подписок поправляет возможные расхождения
+    schedule.every().day.at("03:00").do(Database().reconcile_user_stats)
+    schedule.every().day.at("03:10").do(Database().reconcile_subscriptions)
     
     while True:
         await schedule.run_pending()
@@ -0,0 +1,52 @@
+import os
+from bot.config import logger
+from bot.services.storage.base import (
+    ADDED,
+    MODIFIED,
+    REMOVED,
+    ArrayRemove,
+    ArrayUnion,
+    DocumentChange,
+    DocumentNotFound,
+    DocumentSnapshot,
+    Increment,
+    SERVER_TIMESTAMP,
+    StorageBackend,
+    WriteResult
+)
+
+# firestore - Cloud Firestore (по умолчанию), sqlite - локальный файл
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firestore')
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join('data', 'bot.sqlite3'))
+
+_backend = None
+
+
+def create_backend(name: str = None) -> StorageBackend:
+    """Создание хранилища по имени (по умолчанию - из STORAGE_BACKEND)"""
+    name = (name or STORAGE_BACKEND).lower()
+    if name == 'sqlite':
+        from bot.services.storage.sqlite import SQLiteBackend
+        return SQLiteBackend(SQLITE_PATH)
+    if name == 'firestore':
+        # Firebase инициализируется только при выборе этого хранилища
+        from bot.services.firebase import get_client
+        from bot.services.storage.firestore import FirestoreBackend
+        return FirestoreBackend(get_client())
+    raise ValueError(f"Неизвестное хранилище: {name}")
+
+
+def get_backend() -> StorageBackend:
+    """Хранилище процесса"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+        logger.info(f"Используется хранилище {_backend.name}")
+    return _backend
+
+
+__all__ = [
+    'ADDED', 'MODIFIED', 'REMOVED', 'ArrayRemove', 'ArrayUnion', 'DocumentChange', 'DocumentNotFound',
+    'DocumentSnapshot', 'Increment', 'SERVER_TIMESTAMP', 'StorageBackend', 'WriteResult',
+    'create_backend', 'get_backend'
+]
@@ -0,0 +1,142 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class Increment:
+    """Атомарное увеличение числового поля"""
+    __slots__ = ('value',)
+
+    def __init__(self, value: int | float):
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"Increment({self.value!r})"
+
+
+class ArrayUnion:
+    """Добавление в массив элементов, которых в нем еще нет"""
+    __slots__ = ('values',)
+
+    def __init__(self, values: Iterable[Any]):
+        self.values = list(values)
+
+    def __repr__(self) -> str:
+        return f"ArrayUnion({self.values!r})"
+
+
+class ArrayRemove:
+    """Удаление элементов из массива"""
+    __slots__ = ('values',)
+
+    def __init__(self, values: Iterable[Any]):
+        self.values = list(values)
+
+    def __repr__(self) -> str:
+        return f"ArrayRemove({self.values!r})"
+
+
+class _ServerTimestamp:
+    """Время записи, проставляемое хранилищем"""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __repr__(self) -> str:
+        return 'SERVER_TIMESTAMP'
+
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+class DocumentNotFound(Exception):
+    """Обновление документа, которого нет в хранилище"""
+
+
+def get_field(data: Optional[Dict[str, Any]], field_path: str) -> Any:
+    """Значение поля по пути 'a.b.c' (None, если поля нет)"""
+    value: Any = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+@dataclass
+class DocumentSnapshot:
+    """Прочитанный документ; совместим со снимком документа Firestore"""
+    id: str
+    data: Optional[Dict[str, Any]]
+    update_time: Any = None
+
+    @property
+    def exists(self) -> bool:
+        return self.data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return self.data
+
+    def get(self, field_path: str) -> Any:
+        return get_field(self.data, field_path)
+
+
+@dataclass
+class WriteResult:
+    update_time: Any = None
+
+
+ADDED = 'added'
+MODIFIED = 'modified'
+REMOVED = 'removed'
+
+
+@dataclass
+class DocumentChange:
+    """Изменение документа, о котором сообщает подписка watch()"""
+    kind: str  # ADDED, MODIFIED или REMOVED
+    document: Any  # снимок документа (DocumentSnapshot или снимок Firestore)
+
+
+class StorageBackend(ABC):
+    """Хранилище документов, с которым работает Database
+
+    Повторяет подмножество клиента Firestore: коллекции и документы
+    (get/set/update/delete), запросы where(...).stream(), пакеты записей,
+    чтение нескольких документов и транзакции. Значения Increment,
+    ArrayUnion, ArrayRemove и SERVER_TIMESTAMP из этого модуля понимают
+    все реализации.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def collection(self, name: str):
+        """Ссылка на коллекцию"""
+
+    @abstractmethod
+    def batch(self):
+        """Пакет записей, применяемых одним commit()"""
+
+    @abstractmethod
+    def get_all(self, refs: List, **kwargs) -> Iterable:
+        """Чтение нескольких документов"""
+
+    @abstractmethod
+    def run_transaction(self, func: Callable[[Any], Any]) -> Any:
+        """Выполнение func(transaction) в транзакции (чтения через transaction.get)"""
+
+    def watch(self, collection: str, callback: Callable[[List[DocumentChange]], None]):
+        """Подписка на изменения документов коллекции
+
+        Первым вызовом callback получает все документы как ADDED, дальше -
+        только изменения. callback вызывается в фоновом потоке. Возвращает
+        подписку с методом unsubscribe() и свойством is_active.
+        """
+        raise NotImplementedError(f"Хранилище {self.name} не поддерживает подписку на изменения")
+
+    def close(self):
+        """Освобождение ресурсов хранилища"""
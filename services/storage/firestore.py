@@ -0,0 +1,115 @@
+from typing import Any, Callable, List
+from firebase_admin import firestore
+from bot.services.storage.base import (
+    ArrayRemove, ArrayUnion, DocumentChange, Increment, SERVER_TIMESTAMP, StorageBackend
+)
+
+
+def to_firestore(value: Any) -> Any:
+    """Замена нейтральных значений (Increment, SERVER_TIMESTAMP, ...) на значения Firestore"""
+    if value is SERVER_TIMESTAMP:
+        return firestore.SERVER_TIMESTAMP
+    if isinstance(value, Increment):
+        return firestore.Increment(value.value)
+    if isinstance(value, ArrayUnion):
+        return firestore.ArrayUnion(value.values)
+    if isinstance(value, ArrayRemove):
+        return firestore.ArrayRemove(value.values)
+    if isinstance(value, dict):
+        return {key: to_firestore(item) for key, item in value.items()}
+    return value
+
+
+class FirestoreDocument:
+    def __init__(self, ref):
+        self.ref = ref
+
+    @property
+    def id(self) -> str:
+        return self.ref.id
+
+    @property
+    def path(self) -> str:
+        return self.ref.path
+
+    def get(self, **kwargs):
+        return self.ref.get(**kwargs)
+
+    def set(self, data: dict, merge: bool = False, **kwargs):
+        return self.ref.set(to_firestore(data), merge=merge, **kwargs)
+
+    def update(self, data: dict, **kwargs):
+        return self.ref.update(to_firestore(data), **kwargs)
+
+    def delete(self, **kwargs):
+        return self.ref.delete(**kwargs)
+
+
+class FirestoreQuery:
+    def __init__(self, query):
+        self.query = query
+
+    def where(self, field: str, op: str, value: Any) -> 'FirestoreQuery':
+        return FirestoreQuery(self.query.where(field, op, value))
+
+    def stream(self, **kwargs):
+        return self.query.stream(**kwargs)
+
+
+class FirestoreCollection(FirestoreQuery):
+    def document(self, document_id: str) -> FirestoreDocument:
+        return FirestoreDocument(self.query.document(document_id))
+
+
+class FirestoreBatch:
+    def __init__(self, batch):
+        self.raw = batch
+
+    def set(self, doc: FirestoreDocument, data: dict, merge: bool = False):
+        self.raw.set(doc.ref, to_firestore(data), merge=merge)
+
+    def update(self, doc: FirestoreDocument, data: dict):
+        self.raw.update(doc.ref, to_firestore(data))
+
+    def delete(self, doc: FirestoreDocument):
+        self.raw.delete(doc.ref)
+
+    def commit(self, **kwargs):
+        return self.raw.commit(**kwargs)
+
+
+class FirestoreTransaction(FirestoreBatch):
+    def get(self, doc: FirestoreDocument):
+        return doc.ref.get(transaction=self.raw)
+
+
+class FirestoreBackend(StorageBackend):
+    """Хранилище в Cloud Firestore (синхронный клиент firebase_admin)"""
+
+    name = 'firestore'
+
+    def __init__(self, client):
+        self.client = client
+
+    def collection(self, name: str) -> FirestoreCollection:
+        return FirestoreCollection(self.client.collection(name))
+
+    def batch(self) -> FirestoreBatch:
+        return FirestoreBatch(self.client.batch())
+
+    def get_all(self, refs: List[FirestoreDocument], **kwargs):
+        return self.client.get_all([doc.ref for doc in refs], **kwargs)
+
+    def run_transaction(self, func: Callable[[FirestoreTransaction], Any]) -> Any:
+        @firestore.transactional
+        def apply(transaction):
+            return func(FirestoreTransaction(transaction))
+
+        return apply(self.client.transaction())
+
+    def watch(self, collection: str, callback: Callable[[List[DocumentChange]], None]):
+        def on_snapshot(_, changes, read_time):
+            callback([DocumentChange(change.type.name.lower(), change.document) for change in changes])
+
+        # Watch из google-cloud-firestore: unsubscribe() и is_active
+        return self.client.collection(collection).on_snapshot(on_snapshot)
@@ -0,0 +1,413 @@
+import base64
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from bot.config import logger
+from bot.services.storage.base import (
+    ADDED, MODIFIED, REMOVED, ArrayRemove, ArrayUnion, DocumentChange, DocumentNotFound,
+    DocumentSnapshot, Increment, SERVER_TIMESTAMP, StorageBackend, WriteResult
+)
+
+WATCH_INTERVAL = 1.0  # период опроса версий документов для watch(), секунд
+
+# Коллекции с собственной таблицей: поля профиля вынесены в индексируемые колонки
+USER_COLUMNS = ('role', 'selected_group', 'selected_teacher', 'notifications')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    role TEXT,
+    selected_group TEXT,
+    selected_teacher TEXT,
+    notifications INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    update_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_notifications ON users(notifications);
+CREATE INDEX IF NOT EXISTS idx_users_group ON users(selected_group);
+CREATE INDEX IF NOT EXISTS idx_users_teacher ON users(selected_teacher);
+
+-- Остальные коллекции: расписание и его шарды, группы и преподаватели,
+-- изображения, проверенные даты, агрегаты
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    update_time TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+);
+"""
+
+_DATETIME_KEY = '__datetime__'
+_BYTES_KEY = '__bytes__'
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_DATETIME_KEY: value.isoformat()}
+    if isinstance(value, bytes):
+        return {_BYTES_KEY: base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Значение {type(value).__name__} нельзя сохранить в SQLite")
+
+
+def _decode_hook(value: Dict[str, Any]) -> Any:
+    if len(value) == 1 and _DATETIME_KEY in value:
+        return datetime.fromisoformat(value[_DATETIME_KEY])
+    if len(value) == 1 and _BYTES_KEY in value:
+        return base64.b64decode(value[_BYTES_KEY])
+    return value
+
+
+def encode(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, default=_encode_default)
+
+
+def decode(text: str) -> Dict[str, Any]:
+    return json.loads(text, object_hook=_decode_hook)
+
+
+def _resolve(value: Any, current: Any, now: datetime) -> Any:
+    """Вычисление значения поля с учетом Increment, ArrayUnion и т.п."""
+    if value is SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, Increment):
+        return (current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0) + value.value
+    if isinstance(value, ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        result.extend(item for item in value.values if item not in result)
+        return result
+    if isinstance(value, ArrayRemove):
+        return [item for item in current if item not in value.values] if isinstance(current, list) else []
+    if isinstance(value, dict):
+        return {key: _resolve(item, None, now) for key, item in value.items()}
+    return value
+
+
+def _merge(current: Dict[str, Any], data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Слияние как set(..., merge=True): вложенные словари объединяются"""
+    result = dict(current)
+    for key, value in data.items():
+        existing = result.get(key)
+        if isinstance(value, dict) and isinstance(existing, dict):
+            result[key] = _merge(existing, value, now)
+        else:
+            result[key] = _resolve(value, existing, now)
+    return result
+
+
+def _update(current: Dict[str, Any], data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Обновление как update(): ключи - пути полей 'a.b'"""
+    result = json.loads(encode(current), object_hook=_decode_hook)
+    for field_path, value in data.items():
+        parts = field_path.split('.')
+        node = result
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        node[parts[-1]] = _resolve(value, node.get(parts[-1]), now)
+    return result
+
+
+class SQLiteDocument:
+    def __init__(self, backend: 'SQLiteBackend', collection: str, document_id: str):
+        self.backend = backend
+        self.collection = collection
+        self.id = str(document_id)
+
+    @property
+    def path(self) -> str:
+        return f"{self.collection}/{self.id}"
+
+    def get(self, **kwargs) -> DocumentSnapshot:
+        with self.backend.lock:
+            return self.backend._read(self)
+
+    def set(self, data: Dict[str, Any], merge: bool = False, **kwargs) -> WriteResult:
+        return self.backend._write_many([('set', self, data, merge)])
+
+    def update(self, data: Dict[str, Any], **kwargs) -> WriteResult:
+        return self.backend._write_many([('update', self, data, False)])
+
+    def delete(self, **kwargs) -> WriteResult:
+        return self.backend._write_many([('delete', self, None, False)])
+
+
+class SQLiteQuery:
+    def __init__(self, backend: 'SQLiteBackend', collection: str, filters: Tuple = ()):
+        self.backend = backend
+        self.collection = collection
+        self.filters = filters
+
+    def where(self, field: str, op: str, value: Any) -> 'SQLiteQuery':
+        if op not in ('==', 'in'):
+            raise ValueError(f"Оператор {op} не поддерживается хранилищем SQLite")
+        return SQLiteQuery(self.backend, self.collection, self.filters + ((field, op, value),))
+
+    def stream(self, **kwargs) -> Iterator[DocumentSnapshot]:
+        with self.backend.lock:
+            return iter(self.backend._query(self.collection, self.filters))
+
+
+class SQLiteCollection(SQLiteQuery):
+    def __init__(self, backend: 'SQLiteBackend', name: str):
+        super().__init__(backend, name)
+
+    def document(self, document_id: str) -> SQLiteDocument:
+        return SQLiteDocument(self.backend, self.collection, document_id)
+
+
+class SQLiteBatch:
+    def __init__(self, backend: 'SQLiteBackend'):
+        self.backend = backend
+        self.operations: List[Tuple[str, SQLiteDocument, Optional[Dict], bool]] = []
+
+    def set(self, doc: SQLiteDocument, data: Dict[str, Any], merge: bool = False):
+        self.operations.append(('set', doc, data, merge))
+
+    def update(self, doc: SQLiteDocument, data: Dict[str, Any]):
+        self.operations.append(('update', doc, data, False))
+
+    def delete(self, doc: SQLiteDocument):
+        self.operations.append(('delete', doc, None, False))
+
+    def commit(self, **kwargs) -> List[WriteResult]:
+        result = self.backend._write_many(self.operations)
+        return [result] * len(self.operations)
+
+
+class SQLiteTransaction:
+    """Транзакция: чтения и записи идут внутри одной транзакции SQLite"""
+
+    def __init__(self, backend: 'SQLiteBackend'):
+        self.backend = backend
+
+    def get(self, doc: SQLiteDocument) -> DocumentSnapshot:
+        return self.backend._read(doc)
+
+    def set(self, doc: SQLiteDocument, data: Dict[str, Any], merge: bool = False):
+        self.backend._apply(('set', doc, data, merge), self.backend._next_time())
+
+    def update(self, doc: SQLiteDocument, data: Dict[str, Any]):
+        self.backend._apply(('update', doc, data, False), self.backend._next_time())
+
+    def delete(self, doc: SQLiteDocument):
+        self.backend._apply(('delete', doc, None, False), self.backend._next_time())
+
+
+class SQLiteWatch:
+    """Подписка на изменения коллекции: опрос версий документов в фоновом потоке
+
+    Версия документа - время записи, поэтому видны и изменения, сделанные
+    другими процессами с тем же файлом базы.
+    """
+
+    def __init__(self, backend: 'SQLiteBackend', collection: str,
+                 callback: Callable[[List[DocumentChange]], None], interval: float = WATCH_INTERVAL):
+        self.backend = backend
+        self.collection = collection
+        self.callback = callback
+        self.interval = interval
+        self._versions: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"sqlite-watch-{collection}", daemon=True)
+        self._thread.start()
+
+    @property
+    def is_active(self) -> bool:
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def unsubscribe(self):
+        self._stop.set()
+
+    def _poll(self) -> List[DocumentChange]:
+        with self.backend.lock:
+            versions = self.backend._versions(self.collection)
+            changes = []
+            for document_id, update_time in versions.items():
+                previous = self._versions.get(document_id)
+                if previous != update_time:
+                    snapshot = self.backend._read(SQLiteDocument(self.backend, self.collection, document_id))
+                    changes.append(DocumentChange(ADDED if previous is None else MODIFIED, snapshot))
+            changes.extend(
+                DocumentChange(REMOVED, DocumentSnapshot(document_id, None))
+                for document_id in self._versions if document_id not in versions
+            )
+            self._versions = versions
+        return changes
+
+    def _run(self):
+        first = True
+        while not self._stop.is_set():
+            try:
+                changes = self._poll()
+                # Как и Firestore, первый вызов приходит даже для пустой коллекции
+                if changes or first:
+                    self.callback(changes)
+                first = False
+            except Exception as e:
+                logger.error(f"Ошибка при опросе изменений коллекции {self.collection}: {e}")
+            self._stop.wait(self.interval)
+
+
+class SQLiteBackend(StorageBackend):
+    """Локальное хранилище в SQLite (WAL)
+
+    Пользователи лежат в таблице users с индексами по уведомлениям, группе
+    и преподавателю; остальные коллекции - в таблице documents. Документы
+    хранятся как JSON. Соединение одно на процесс, доступ сериализуется
+    блокировкой, поэтому с хранилищем можно работать из пула потоков.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._last_time = datetime.now(timezone.utc)
+        self._watches: List[SQLiteWatch] = []
+
+    def _next_time(self) -> datetime:
+        """Время записи; строго возрастает, чтобы служить версией документа"""
+        now = datetime.now(timezone.utc)
+        if now <= self._last_time:
+            now = self._last_time + timedelta(microseconds=1)
+        self._last_time = now
+        return now
+
+    def _read(self, doc: SQLiteDocument) -> DocumentSnapshot:
+        if doc.collection == 'users':
+            row = self.conn.execute('SELECT data, update_time FROM users WHERE id = ?', (doc.id,)).fetchone()
+        else:
+            row = self.conn.execute(
+                'SELECT data, update_time FROM documents WHERE collection = ? AND id = ?',
+                (doc.collection, doc.id)
+            ).fetchone()
+        if row is None:
+            return DocumentSnapshot(doc.id, None)
+        return DocumentSnapshot(doc.id, decode(row[0]), datetime.fromisoformat(row[1]))
+
+    def _store(self, doc: SQLiteDocument, data: Dict[str, Any], update_time: datetime):
+        if doc.collection == 'users':
+            columns = [data.get(name) for name in USER_COLUMNS]
+            columns[-1] = 1 if columns[-1] else 0
+            self.conn.execute(
+                'INSERT OR REPLACE INTO users (id, role, selected_group, selected_teacher, notifications, data, update_time) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (doc.id, *columns, encode(data), update_time.isoformat())
+            )
+        else:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO documents (collection, id, data, update_time) VALUES (?, ?, ?, ?)',
+                (doc.collection, doc.id, encode(data), update_time.isoformat())
+            )
+
+    def _delete(self, doc: SQLiteDocument):
+        if doc.collection == 'users':
+            self.conn.execute('DELETE FROM users WHERE id = ?', (doc.id,))
+        else:
+            self.conn.execute('DELETE FROM documents WHERE collection = ? AND id = ?', (doc.collection, doc.id))
+
+    def _apply(self, operation: Tuple[str, SQLiteDocument, Optional[Dict], bool], now: datetime):
+        kind, doc, data, merge = operation
+        if kind == 'delete':
+            self._delete(doc)
+            return
+        current = self._read(doc).data
+        if kind == 'update':
+            if current is None:
+                raise DocumentNotFound(doc.path)
+            new = _update(current, data, now)
+        elif merge and current is not None:
+            new = _merge(current, data, now)
+        else:
+            new = _merge({}, data, now)
+        self._store(doc, new, now)
+
+    def _write_many(self, operations: List) -> WriteResult:
+        with self.lock:
+            now = self._next_time()
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                for operation in operations:
+                    self._apply(operation, now)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            return WriteResult(now)
+
+    def _versions(self, collection: str) -> Dict[str, str]:
+        """Версии (время записи) всех документов коллекции"""
+        if collection == 'users':
+            rows = self.conn.execute('SELECT id, update_time FROM users').fetchall()
+        else:
+            rows = self.conn.execute(
+                'SELECT id, update_time FROM documents WHERE collection = ?', (collection,)
+            ).fetchall()
+        return dict(rows)
+
+    def _query(self, collection: str, filters: Tuple) -> List[DocumentSnapshot]:
+        if collection == 'users':
+            sql, params = 'SELECT id, data, update_time FROM users', []
+            conditions = []
+        else:
+            sql, params = 'SELECT id, data, update_time FROM documents', [collection]
+            conditions = ['collection = ?']
+
+        for field, op, value in filters:
+            if collection == 'users' and field in USER_COLUMNS:
+                column = field
+            else:
+                column = f"json_extract(data, '$.{field}')"
+            values = list(value) if op == 'in' else [value]
+            # В SQLite логические значения хранятся как 0/1
+            values = [int(item) if isinstance(item, bool) else item for item in values]
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        rows = self.conn.execute(sql, params).fetchall()
+        return [DocumentSnapshot(row[0], decode(row[1]), datetime.fromisoformat(row[2])) for row in rows]
+
+    def collection(self, name: str) -> SQLiteCollection:
+        return SQLiteCollection(self, name)
+
+    def batch(self) -> SQLiteBatch:
+        return SQLiteBatch(self)
+
+    def get_all(self, refs: List[SQLiteDocument], **kwargs) -> List[DocumentSnapshot]:
+        with self.lock:
+            return [self._read(doc) for doc in refs]
+
+    def run_transaction(self, func: Callable[[SQLiteTransaction], Any]) -> Any:
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(SQLiteTransaction(self))
+                self.conn.execute('COMMIT')
+                return result
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def watch(self, collection: str, callback: Callable[[List[DocumentChange]], None]) -> SQLiteWatch:
+        watch = SQLiteWatch(self, collection, callback)
+        self._watches.append(watch)
+        return watch
+
+    def close(self):
+        for watch in self._watches:
+            watch.unsubscribe()
+        with self.lock:
+            self.conn.close()
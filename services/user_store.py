@@ -0,0 +1,221 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from bot.config import logger
+from bot.services.database import Database
+from bot.utils.subscriptions import merge_subscription_changes, subscription_changes
+from bot.utils.user_stats import counter_delta, merge_deltas
+
+USER_CACHE_SIZE = 5000
+NEGATIVE_TTL = 30  # сколько секунд помнить, что пользователя нет в базе
+FLUSH_INTERVAL = 5  # период пакетной записи изменений, секунд
+
+
+@dataclass
+class UserProfile:
+    """Профиль пользователя, который middleware передает в обработчики"""
+    user_id: int
+    role: Optional[str] = None
+    selected_group: Optional[str] = None
+    selected_teacher: Optional[str] = None
+    notifications: bool = False
+    data: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_dict(cls, user_id: int, data: Dict[str, Any]) -> 'UserProfile':
+        return cls(
+            user_id=user_id,
+            role=data.get('role'),
+            selected_group=data.get('selected_group'),
+            selected_teacher=data.get('selected_teacher'),
+            notifications=bool(data.get('notifications', False)),
+            data=data
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Профиль в виде словаря, с которым работают форматтер, парсер и клавиатуры"""
+        return {
+            **self.data,
+            'role': self.role,
+            'selected_group': self.selected_group,
+            'selected_teacher': self.selected_teacher,
+            'notifications': self.notifications
+        }
+
+
+class UserProfileStore:
+    """Профили пользователей в памяти с отложенной записью в Firestore
+
+    Горячие профили лежат в LRU ограниченного размера. Изменения сразу
+    применяются к профилю в памяти и копятся в очереди, которая пакетно
+    записывается по таймеру, перед запросами по всей коллекции и при остановке.
+    """
+
+    def __init__(self, db: Optional[Database] = None, max_size: int = USER_CACHE_SIZE,
+                 negative_ttl: float = NEGATIVE_TTL, flush_interval: float = FLUSH_INTERVAL):
+        self.db = db or Database()
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self.flush_interval = flush_interval
+        self._profiles: OrderedDict[int, Dict[str, Any]] = OrderedDict()
+        self._missing: Dict[int, float] = {}
+        # user_id -> поля, еще не записанные в Firestore
+        self._dirty: Dict[int, Dict[str, Any]] = {}
+        # Изменения агрегатов stats/users, записываются тем же пакетом
+        self._stats_delta: Dict[tuple, int] = {}
+        # Изменения индекса подписок: цель -> {user_id: подписан}
+        self._subscriptions: Dict[tuple, Dict[int, bool]] = {}
+        self._flush_lock = asyncio.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'updates': 0, 'flushes': 0, 'flushed_users': 0, 'evictions': 0}
+        # Запросы по всей коллекции должны видеть отложенные изменения
+        self.db.set_write_behind(self.flush)
+
+    def _put(self, user_id: int, profile: Dict[str, Any]):
+        self._profiles[user_id] = profile
+        self._profiles.move_to_end(user_id)
+        while len(self._profiles) > self.max_size:
+            # Несохраненные поля остаются в _dirty и накладываются при повторной загрузке
+            self._profiles.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Профиль пользователя (копия) или None, если пользователя нет
+
+        Ошибка чтения пробрасывается: отсутствие пользователя запоминается
+        только подтвержденное базой, иначе сбой выглядел бы как незарегистрированный
+        пользователь, а /start перезаписал бы его настройки.
+        """
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            self._profiles.move_to_end(user_id)
+            self.stats['hits'] += 1
+            return dict(profile)
+
+        expires = self._missing.get(user_id)
+        if expires is not None:
+            if expires > time.monotonic():
+                self.stats['hits'] += 1
+                return None
+            del self._missing[user_id]
+
+        self.stats['misses'] += 1
+        profile = await self.db.read_user(user_id)
+        if profile is None:
+            self._missing[user_id] = time.monotonic() + self.negative_ttl
+            return None
+
+        # Неотправленные изменения новее прочитанной версии
+        profile.update(self._dirty.get(user_id, {}))
+        self._put(user_id, profile)
+        return dict(profile)
+
+    async def get_profile(self, user_id: int) -> Optional[UserProfile]:
+        """Типизированный профиль пользователя или None (ошибка чтения пробрасывается)"""
+        data = await self.get_user(user_id)
+        return UserProfile.from_dict(user_id, data) if data is not None else None
+
+    async def user_exists(self, user_id: int) -> bool:
+        """Проверка существования пользователя"""
+        return await self.get_user(user_id) is not None
+
+    async def create_user(self, user_id: int) -> bool:
+        """Создание пользователя (записывается сразу, без очереди)"""
+        if not await self.db.create_user(user_id):
+            return False
+        self._missing.pop(user_id, None)
+        self._dirty.pop(user_id, None)
+        # created_at проставляет сервер, поэтому профиль перечитается при первом обращении
+        self._profiles.pop(user_id, None)
+        return True
+
+    async def update(self, user_id: int, **fields: Any):
+        """Изменение полей профиля с отложенной записью"""
+        if user_id not in self._profiles:
+            # Профиль нужен, чтобы посчитать изменение агрегатов
+            try:
+                await self.get_user(user_id)
+            except Exception as e:
+                # Поля все равно записываем, агрегаты поправит ночной пересчет
+                logger.error(f"Ошибка при загрузке профиля пользователя {user_id}: {e}")
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            updated = {**profile, **fields}
+            merge_deltas(self._stats_delta, counter_delta(profile, updated))
+            merge_subscription_changes(self._subscriptions, subscription_changes(user_id, profile, updated))
+            profile.update(fields)
+        self._dirty.setdefault(user_id, {}).update(fields)
+        self.stats['updates'] += 1
+
+    async def update_user_role(self, user_id: int, role: str) -> bool:
+        """Обновление роли пользователя"""
+        await self.update(user_id, role=role)
+        logger.info(f"Роль пользователя {user_id} обновлена на {role}")
+        return True
+
+    async def update_selected_teacher(self, user_id: int, teacher: str) -> bool:
+        """Обновление выбранного преподавателя"""
+        await self.update(user_id, selected_teacher=teacher)
+        logger.info(f"Выбранный преподаватель пользователя {user_id} обновлен на {teacher}")
+        return True
+
+    async def update_selected_group(self, user_id: int, group: str) -> bool:
+        """Обновление выбранной группы"""
+        await self.update(user_id, selected_group=group)
+        logger.info(f"Выбранная группа пользователя {user_id} обновлена на {group}")
+        return True
+
+    async def toggle_notifications(self, user_id: int, enabled: bool) -> bool:
+        """Включение/выключение уведомлений"""
+        await self.update(user_id, notifications=enabled)
+        logger.info(f"Уведомления для пользователя {user_id} {'включены' if enabled else 'выключены'}")
+        return True
+
+    async def flush(self) -> bool:
+        """Пакетная запись накопленных изменений"""
+        async with self._flush_lock:
+            if not self._dirty and not self._stats_delta and not self._subscriptions:
+                return True
+            pending, self._dirty = self._dirty, {}
+            stats_delta, self._stats_delta = self._stats_delta, {}
+            subscriptions, self._subscriptions = self._subscriptions, {}
+            result = await self.db.apply_user_updates(pending, stats_delta, subscriptions)
+            if not result.failed:
+                self.stats['flushes'] += 1
+                self.stats['flushed_users'] += len(pending)
+                return True
+
+            # Возвращаем в очередь только незаписанное, не затирая пришедшее за время записи
+            for user_id, fields in result.updates.items():
+                self._dirty[user_id] = {**fields, **self._dirty.get(user_id, {})}
+            merge_deltas(self._stats_delta, result.stats_delta)
+            # Более поздние изменения подписок важнее возвращаемых
+            for key, users in result.subscriptions.items():
+                for user_id, subscribed in users.items():
+                    self._subscriptions.setdefault(key, {}).setdefault(user_id, subscribed)
+            return False
+
+    async def run(self):
+        """Периодическая запись изменений"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при записи профилей пользователей: {e}")
+
+    async def close(self):
+        """Запись оставшихся изменений при остановке"""
+        if not await self.flush():
+            logger.error(f"Не удалось сохранить изменения {len(self._dirty)} пользователей при остановке")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'cached': len(self._profiles),
+            'pending': len(self._dirty)
+        }
+
+
+user_store = UserProfileStore()
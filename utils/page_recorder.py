@@ -0,0 +1,81 @@
+import gzip
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+INDEX_FILE = 'index.jsonl'
+
+
+@dataclass
+class Fixture:
+    """Сохраненная страница, которую видел парсер"""
+    path: Path
+    source: str
+    recorded_at: datetime
+    url: Optional[str]
+
+    def read(self) -> str:
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            return f.read()
+
+
+class PageRecorder:
+    """Запись и воспроизведение сырых HTML-страниц парсера
+
+    Каждая страница сохраняется в отдельный .html.gz с меткой времени
+    в имени, метаданные дописываются в index.jsonl того же каталога.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+
+    def record(self, html: str, source: str, url: Optional[str] = None) -> Path:
+        """Сохранение страницы (source - откуда получена: http, selenium, ...)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        recorded_at = datetime.now()
+        name = f"{recorded_at:%Y%m%d-%H%M%S-%f}_{re.sub(r'[^a-z0-9-]', '', source.lower())}.html.gz"
+        path = self.directory / name
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(html)
+
+        entry = {
+            'file': name,
+            'source': source,
+            'url': url,
+            'recorded_at': recorded_at.isoformat(),
+            'size': len(html)
+        }
+        with open(self.directory / INDEX_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return path
+
+    def fixtures(self) -> Iterator[Fixture]:
+        """Сохраненные страницы в порядке записи"""
+        index_path = self.directory / INDEX_FILE
+        if index_path.exists():
+            with open(index_path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    path = self.directory / entry['file']
+                    if path.exists():
+                        yield Fixture(
+                            path=path,
+                            source=entry.get('source', ''),
+                            recorded_at=datetime.fromisoformat(entry['recorded_at']),
+                            url=entry.get('url')
+                        )
+            return
+
+        # Каталог без индекса: берем файлы по имени
+        for path in sorted(self.directory.glob('*.html.gz')):
+            stamp, _, source = path.name[:-len('.html.gz')].partition('_')
+            try:
+                recorded_at = datetime.strptime(stamp, '%Y%m%d-%H%M%S-%f')
+            except ValueError:
+                recorded_at = datetime.fromtimestamp(path.stat().st_mtime)
+            yield Fixture(path=path, source=source, recorded_at=recorded_at, url=None)
@@ -0,0 +1,103 @@
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+# Месяц по первым трем буквам: 'нояб', 'ноя', 'ноября' -> 11
+MONTH_PREFIXES = {
+    'янв': 1, 'фев': 2, 'мар': 3, 'апр': 4,
+    'май': 5, 'мая': 5, 'июн': 6, 'июл': 7, 'авг': 8,
+    'сен': 9, 'окт': 10, 'ноя': 11, 'дек': 12
+}
+
+# Индекс = ISO-номер дня недели - 1
+WEEKDAY_NAMES = ('понедельник', 'вторник', 'среда', 'четверг', 'пятница', 'суббота', 'воскресенье')
+
+
+class DateInfo:
+    """Разобранный ключ даты расписания"""
+    __slots__ = ('key', 'date', 'iso_weekday', 'ordinal')
+
+    def __init__(self, key: str, value: date):
+        self.key = key
+        self.date = value
+        self.iso_weekday = value.isoweekday()
+        self.ordinal = value.toordinal()
+
+    @property
+    def weekday_name(self) -> str:
+        return WEEKDAY_NAMES[self.iso_weekday - 1]
+
+    def __repr__(self) -> str:
+        return f"DateInfo({self.key!r}, {self.date.isoformat()})"
+
+
+def _nearest_year(month: int, day: int, reference: date) -> Optional[date]:
+    """Дата с годом, ближайшим к reference (учитывает переход декабрь/январь)"""
+    candidates = []
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            continue
+    if not candidates:
+        return None
+    return min(candidates, key=lambda value: abs(value - reference))
+
+
+def parse_date_key(key: str, reference: Optional[date] = None) -> Optional[date]:
+    """Разбор ключа даты ('26-нояб', '3-янв', '24.12.2024') без учета локали"""
+    if not isinstance(key, str):
+        return None
+    return _parse_date_key(key, reference or date.today())
+
+
+@lru_cache(maxsize=1024)
+def _parse_date_key(key: str, reference: date) -> Optional[date]:
+    key = key.strip().strip('()')
+    try:
+        if '-' in key:
+            day, month = key.split('-', 1)
+            month_num = MONTH_PREFIXES.get(month.strip().lower()[:3])
+            if not month_num:
+                return None
+            return _nearest_year(month_num, int(day), reference)
+        if '.' in key:
+            return datetime.strptime(key, '%d.%m.%Y').date()
+    except ValueError:
+        return None
+    return None
+
+
+class CalendarIndex:
+    """Календарь снимка расписания: ключ даты -> реальная дата, день недели, порядок"""
+    __slots__ = ('entries', 'sorted_keys', '_by_weekday')
+
+    def __init__(self, keys: Iterable[str], reference: Optional[date] = None):
+        reference = reference or date.today()
+        self.entries: Dict[str, DateInfo] = {}
+        for key in keys:
+            value = parse_date_key(key, reference)
+            if value is not None:
+                self.entries[key] = DateInfo(key, value)
+
+        self.sorted_keys: List[str] = sorted(self.entries, key=lambda k: self.entries[k].ordinal)
+        self._by_weekday: Dict[int, List[str]] = {}
+        for key in self.sorted_keys:
+            self._by_weekday.setdefault(self.entries[key].iso_weekday, []).append(key)
+
+    def get(self, key: str) -> Optional[DateInfo]:
+        return self.entries.get(key)
+
+    def keys_for_weekday(self, weekday: int | str) -> List[str]:
+        """Ключи дат для дня недели (ISO-номер или русское название)"""
+        if isinstance(weekday, str):
+            name = weekday.lower()
+            if name not in WEEKDAY_NAMES:
+                return []
+            weekday = WEEKDAY_NAMES.index(name) + 1
+        return self._by_weekday.get(weekday, [])
+
+    def sort_key(self, key: str) -> int:
+        """Порядковый номер даты для сортировки (неизвестные даты - в конец)"""
+        info = self.entries.get(key)
+        return info.ordinal if info else date.max.toordinal()
@@ -0,0 +1,193 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from bot.utils.schedule_hash import content_hash
+
+ADDED = 'added'
+REMOVED = 'removed'
+MOVED = 'moved'
+ROOM = 'room'
+TEACHER = 'teacher'
+
+LESSON_FIELDS = ('number', 'discipline', 'teacher', 'classroom', 'subgroup')
+
+
+@dataclass
+class LessonChange:
+    """Изменение одной пары"""
+    kind: str
+    date: str
+    group: str
+    old: Optional[Dict] = None
+    new: Optional[Dict] = None
+
+    @property
+    def teachers(self) -> set:
+        """Преподаватели, которых затрагивает изменение"""
+        names = set()
+        for lesson in (self.old, self.new):
+            if lesson and lesson.get('teacher'):
+                names.add(lesson['teacher'])
+        return names
+
+
+@dataclass
+class ScheduleDiff:
+    """Изменения между двумя версиями расписания"""
+    added_dates: List[str] = field(default_factory=list)
+    removed_dates: List[str] = field(default_factory=list)
+    # дата -> группа -> изменения
+    groups: Dict[str, Dict[str, List[LessonChange]]] = field(default_factory=dict)
+    # преподаватель -> дата -> изменения
+    teachers: Dict[str, Dict[str, List[LessonChange]]] = field(default_factory=dict)
+    # хэши корзин (дата, группа) новой версии
+    hashes: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    skipped_buckets: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.groups and not self.added_dates and not self.removed_dates
+
+    def for_date(self, date: str) -> List[LessonChange]:
+        return [change for changes in self.groups.get(date, {}).values() for change in changes]
+
+    def for_group(self, group: str) -> Dict[str, List[LessonChange]]:
+        return {date: groups[group] for date, groups in self.groups.items() if group in groups}
+
+    def for_teacher(self, teacher: str) -> Dict[str, List[LessonChange]]:
+        return self.teachers.get(teacher, {})
+
+    def summary(self) -> Dict[str, int]:
+        counts = Counter(
+            change.kind
+            for groups in self.groups.values()
+            for changes in groups.values()
+            for change in changes
+        )
+        return {
+            'added_dates': len(self.added_dates),
+            'removed_dates': len(self.removed_dates),
+            'changed_buckets': sum(len(groups) for groups in self.groups.values()),
+            'skipped_buckets': self.skipped_buckets,
+            **{kind: counts.get(kind, 0) for kind in (ADDED, REMOVED, MOVED, ROOM, TEACHER)}
+        }
+
+
+def _lesson_key(lesson: Dict) -> Tuple:
+    return tuple(str(lesson.get(name, '')) for name in LESSON_FIELDS)
+
+
+def bucket_hash(lessons: List[Dict]) -> str:
+    """Хэш пар одной группы за один день"""
+    return content_hash([_lesson_key(lesson) for lesson in lessons])
+
+
+def bucket_hashes(schedule_data: Optional[Dict]) -> Dict[str, Dict[str, str]]:
+    """Хэши всех корзин (дата, группа) расписания"""
+    return {
+        date: {group: bucket_hash(lessons) for group, lessons in groups.items()}
+        for date, groups in (schedule_data or {}).items()
+    }
+
+
+def _pop_match(candidates: List[Dict], predicate) -> Optional[Dict]:
+    for i, lesson in enumerate(candidates):
+        if predicate(lesson):
+            return candidates.pop(i)
+    return None
+
+
+def diff_lessons(date: str, group: str, old: List[Dict], new: List[Dict]) -> List[LessonChange]:
+    """Изменения пар одной группы за один день"""
+    # Убираем совпадающие пары (с учетом повторов)
+    new_keys = Counter(_lesson_key(lesson) for lesson in new)
+    old_keys = Counter(_lesson_key(lesson) for lesson in old)
+    removed = []
+    for lesson in old:
+        key = _lesson_key(lesson)
+        if new_keys[key] > 0:
+            new_keys[key] -= 1
+        else:
+            removed.append(lesson)
+    added = []
+    for lesson in new:
+        key = _lesson_key(lesson)
+        if old_keys[key] > 0:
+            old_keys[key] -= 1
+        else:
+            added.append(lesson)
+
+    changes = []
+
+    # Та же пара на том же месте: сменился кабинет и/или преподаватель
+    for lesson in list(added):
+        previous = _pop_match(removed, lambda old_lesson: (
+            str(old_lesson.get('number')) == str(lesson.get('number'))
+            and old_lesson.get('subgroup') == lesson.get('subgroup')
+            and old_lesson.get('discipline') == lesson.get('discipline')
+        ))
+        if previous is None:
+            continue
+        added.remove(lesson)
+        if previous.get('teacher') != lesson.get('teacher'):
+            changes.append(LessonChange(TEACHER, date, group, previous, lesson))
+        if previous.get('classroom') != lesson.get('classroom'):
+            changes.append(LessonChange(ROOM, date, group, previous, lesson))
+
+    # Та же дисциплина у того же преподавателя, но другим номером пары
+    for lesson in list(added):
+        previous = _pop_match(removed, lambda old_lesson: (
+            old_lesson.get('discipline') == lesson.get('discipline')
+            and old_lesson.get('teacher') == lesson.get('teacher')
+            and old_lesson.get('subgroup') == lesson.get('subgroup')
+        ))
+        if previous is None:
+            continue
+        added.remove(lesson)
+        changes.append(LessonChange(MOVED, date, group, previous, lesson))
+
+    changes.extend(LessonChange(REMOVED, date, group, old=lesson) for lesson in removed)
+    changes.extend(LessonChange(ADDED, date, group, new=lesson) for lesson in added)
+    return changes
+
+
+def diff_schedules(old: Optional[Dict], new: Optional[Dict],
+                   old_hashes: Optional[Dict[str, Dict[str, str]]] = None,
+                   new_hashes: Optional[Dict[str, Dict[str, str]]] = None) -> ScheduleDiff:
+    """Сравнение двух версий расписания {дата: {группа: [пары]}}
+
+    Корзины (дата, группа) с одинаковым хэшем пропускаются без сравнения пар.
+    Хэши старой версии можно передать заранее сохраненными.
+    """
+    old = old or {}
+    new = new or {}
+    if old_hashes is None:
+        old_hashes = bucket_hashes(old)
+    if new_hashes is None:
+        new_hashes = bucket_hashes(new)
+
+    diff = ScheduleDiff(hashes=new_hashes)
+    diff.added_dates = [date for date in new if date not in old]
+    diff.removed_dates = [date for date in old if date not in new]
+
+    for date in list(new) + diff.removed_dates:
+        old_groups = old.get(date, {})
+        new_groups = new.get(date, {})
+        old_date_hashes = old_hashes.get(date, {})
+        new_date_hashes = new_hashes.get(date, {})
+
+        for group in list(new_groups) + [g for g in old_groups if g not in new_groups]:
+            old_hash = old_date_hashes.get(group)
+            if old_hash is not None and old_hash == new_date_hashes.get(group):
+                diff.skipped_buckets += 1
+                continue
+
+            changes = diff_lessons(date, group, old_groups.get(group, []), new_groups.get(group, []))
+            if not changes:
+                continue
+            diff.groups.setdefault(date, {})[group] = changes
+            for change in changes:
+                for teacher in change.teachers:
+                    diff.teachers.setdefault(teacher, {}).setdefault(date, []).append(change)
+
+    return diff
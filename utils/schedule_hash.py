@@ -0,0 +1,9 @@
+import hashlib
+import json
+from typing import Any
+
+
+def content_hash(data: Any) -> str:
+    """Хэш содержимого расписания, не зависящий от порядка ключей"""
+    normalized = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
@@ -0,0 +1,216 @@
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+from bot.utils.schedule_calendar import CalendarIndex
+
+LESSON_KEYS = ('number', 'discipline', 'teacher', 'classroom', 'subgroup', 'group')
+
+
+class StringTable:
+    """Таблица интернированных строк одного вида (группы, преподаватели, ...)"""
+    __slots__ = ('_ids', 'values')
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: Any) -> Any:
+        """Каноничный экземпляр строки (не строки возвращаются как есть)"""
+        if not isinstance(value, str):
+            return value
+        index = self._ids.get(value)
+        if index is None:
+            index = len(self.values)
+            self._ids[value] = index
+            self.values.append(value)
+        return self.values[index]
+
+    def id(self, value: str) -> Optional[int]:
+        return self._ids.get(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __contains__(self, value: str) -> bool:
+        return value in self._ids
+
+
+class Lesson:
+    """Пара в компактном виде
+
+    Поддерживает доступ как к словарю (lesson['teacher'], lesson.get(...)),
+    поэтому форматтер и клавиатуры работают с ней без изменений.
+    lesson['group'] - группа, к которой относится пара; исходное значение
+    поля 'group' сохраняется отдельно и возвращается в to_dict().
+    """
+    __slots__ = ('number', 'discipline', 'teacher', 'classroom', 'subgroup', 'group', 'raw_group')
+
+    def __init__(self, number, discipline, teacher, classroom, subgroup, group, raw_group):
+        self.number = number
+        self.discipline = discipline
+        self.teacher = teacher
+        self.classroom = classroom
+        self.subgroup = subgroup
+        self.group = group
+        self.raw_group = raw_group
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in LESSON_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in LESSON_KEYS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def __contains__(self, key: str) -> bool:
+        return key in LESSON_KEYS and getattr(self, key) is not None
+
+    def keys(self) -> Tuple[str, ...]:
+        return LESSON_KEYS
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Исходный вид пары для хранения"""
+        lesson = {
+            'number': self.number,
+            'discipline': self.discipline,
+            'teacher': self.teacher,
+            'classroom': self.classroom,
+            'subgroup': self.subgroup,
+            'group': self.raw_group
+        }
+        return {key: value for key, value in lesson.items() if value is not None}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Lesson):
+            return self.to_dict() == other.to_dict() and self.group == other.group
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Lesson({self.number}, {self.discipline!r}, {self.teacher!r}, {self.group!r})"
+
+
+class CompactSchedule:
+    """Расписание с интернированными строками вместо вложенных словарей
+
+    Повторяющиеся названия групп, дисциплин, преподавателей и кабинетов
+    хранятся в одном экземпляре; пары - объекты со __slots__. День
+    переводится в компактный вид при первом обращении, поэтому расписание
+    из снимка (LazySchedule) распаковывается только по читаемым дням.
+    Выборки по всем дням (group_schedule, teacher_schedule, to_dict)
+    распаковывают расписание целиком.
+    """
+    __slots__ = ('groups', 'teachers', 'disciplines', 'classrooms', 'calendar', '_other', '_source',
+                 '_dates', '_days', '_teacher_days', '__weakref__')
+
+    def __init__(self, schedule_data: Optional[Mapping] = None):
+        self.groups = StringTable()
+        self.teachers = StringTable()
+        self.disciplines = StringTable()
+        self.classrooms = StringTable()
+        self._other = StringTable()
+        self._source: Mapping = schedule_data or {}
+        self._dates: Dict[str, None] = {self._other.intern(date): None for date in self._source}
+        # дата -> группа -> пары (только уже построенные дни)
+        self._days: Dict[str, Dict[str, Tuple[Lesson, ...]]] = {}
+        # Индекс преподавателей по дням: дата -> преподаватель -> пары (группа есть в каждой паре)
+        self._teacher_days: Dict[str, Dict[str, List[Lesson]]] = {}
+        # Календарь строится один раз на снимок по ключам дат, без распаковки дней:
+        # дальше день недели и порядок дат читаются из индекса без разбора строк
+        self.calendar = CalendarIndex(self._dates)
+
+    @classmethod
+    def from_dict(cls, schedule_data: Optional[Mapping]) -> 'CompactSchedule':
+        """Построение из формата {дата: {группа: [пары]}}; дни строятся при первом обращении"""
+        return cls(schedule_data)
+
+    def _build_day(self, date: str) -> Dict[str, Tuple[Lesson, ...]]:
+        """Перевод одного дня в компактный вид вместе с индексом преподавателей"""
+        day: Dict[str, Tuple[Lesson, ...]] = {}
+        teachers: Dict[str, List[Lesson]] = {}
+        for group, lessons in self._source[date].items():
+            group = self.groups.intern(group)
+            day[group] = tuple(self._make_lesson(lesson, group) for lesson in lessons)
+            for lesson in day[group]:
+                if lesson.teacher:
+                    teachers.setdefault(lesson.teacher, []).append(lesson)
+        self._days[date] = day
+        self._teacher_days[date] = teachers
+        return day
+
+    def _make_lesson(self, lesson: Dict, group: str) -> Lesson:
+        return Lesson(
+            number=lesson.get('number'),
+            discipline=self.disciplines.intern(lesson.get('discipline')),
+            teacher=self.teachers.intern(lesson.get('teacher')),
+            classroom=self.classrooms.intern(lesson.get('classroom')),
+            subgroup=self._other.intern(lesson.get('subgroup')),
+            group=group,
+            raw_group=self._other.intern(lesson.get('group'))
+        )
+
+    def to_dict(self) -> Dict[str, Dict[str, List[Dict]]]:
+        """Обратное преобразование в формат хранения без потерь"""
+        return {
+            date: {group: [lesson.to_dict() for lesson in lessons] for group, lessons in self.day(date).items()}
+            for date in self._dates
+        }
+
+    @property
+    def dates(self) -> List[str]:
+        return list(self._dates)
+
+    @property
+    def built_days(self) -> int:
+        """Сколько дней уже переведено в компактный вид"""
+        return len(self._days)
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def __contains__(self, date: str) -> bool:
+        return date in self._dates
+
+    def day(self, date: str) -> Dict[str, Tuple[Lesson, ...]]:
+        day = self._days.get(date)
+        if day is None:
+            if date not in self._dates:
+                return {}
+            day = self._build_day(date)
+        return day
+
+    def _day_teachers(self, date: str) -> Dict[str, List[Lesson]]:
+        self.day(date)
+        return self._teacher_days.get(date, {})
+
+    def iter_lessons(self) -> Iterator[Tuple[str, Lesson]]:
+        for date in self._dates:
+            for lessons in self.day(date).values():
+                for lesson in lessons:
+                    yield date, lesson
+
+    def group_lessons(self, date: str, group: str) -> List[Lesson]:
+        return list(self.day(date).get(group, ()))
+
+    def group_schedule(self, group: str) -> Dict[str, List[Lesson]]:
+        """Пары группы по датам (только дни, где группа есть в расписании)"""
+        return {
+            date: list(groups[group])
+            for date, groups in ((date, self.day(date)) for date in self._dates)
+            if group in groups
+        }
+
+    def teacher_lessons(self, date: str, teacher: str) -> List[Lesson]:
+        return list(self._day_teachers(date).get(teacher, ()))
+
+    def teacher_schedule(self, teacher: str) -> Dict[str, List[Lesson]]:
+        """Пары преподавателя по датам (дни без пар не включаются)"""
+        return {
+            date: list(lessons)
+            for date, lessons in ((date, self._day_teachers(date).get(teacher)) for date in self._dates)
+            if lessons
+        }
+
+    def teachers_on(self, date: str) -> List[str]:
+        """Преподаватели, у которых есть пары в этот день"""
+        return list(self._day_teachers(date))
@@ -0,0 +1,75 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from bot.utils.schedule_diff import bucket_hashes
+from bot.utils.schedule_hash import content_hash
+
+
+def shard_id(*parts: str) -> str:
+    """Идентификатор документа-шарда ('/' в id документа Firestore недопустим)"""
+    return '__'.join(str(part).replace('/', '_') for part in parts)
+
+
+def teacher_projections(schedule_data: Optional[Dict]) -> Dict[str, Dict[str, List[Dict]]]:
+    """Пары каждого преподавателя по датам {преподаватель: {дата: [пары с группой]}}"""
+    projections: Dict[str, Dict[str, List[Dict]]] = {}
+    for date, groups in (schedule_data or {}).items():
+        for group, lessons in groups.items():
+            for lesson in lessons:
+                teacher = lesson.get('teacher')
+                if teacher:
+                    projections.setdefault(teacher, {}).setdefault(date, []).append({**lesson, 'group': group})
+    return projections
+
+
+@dataclass
+class ShardPlan:
+    """Какие документы-шарды записать и удалить при переходе на новую версию"""
+    # (дата, группа) -> пары
+    group_writes: Dict[Tuple[str, str], List[Dict]] = field(default_factory=dict)
+    group_deletes: List[Tuple[str, str]] = field(default_factory=list)
+    # преподаватель -> {дата: пары}
+    teacher_writes: Dict[str, Dict[str, List[Dict]]] = field(default_factory=dict)
+    teacher_deletes: List[str] = field(default_factory=list)
+    manifest: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def operations(self) -> int:
+        return len(self.group_writes) + len(self.group_deletes) + len(self.teacher_writes) + len(self.teacher_deletes)
+
+
+def plan_shards(old_manifest: Optional[Dict], schedule_data: Dict,
+                group_hashes: Optional[Dict[str, Dict[str, str]]] = None) -> ShardPlan:
+    """План записи: только корзины, хэш которых отличается от манифеста
+
+    Хэши корзин новой версии можно передать уже посчитанными (например, из diff).
+    """
+    old_manifest = old_manifest or {}
+    old_groups = old_manifest.get('groups', {})
+    old_teachers = old_manifest.get('teachers', {})
+
+    if group_hashes is None:
+        group_hashes = bucket_hashes(schedule_data)
+    projections = teacher_projections(schedule_data)
+    teacher_hashes = {teacher: content_hash(days) for teacher, days in projections.items()}
+
+    plan = ShardPlan()
+    for date, groups in group_hashes.items():
+        for group, bucket in groups.items():
+            if old_groups.get(date, {}).get(group) != bucket:
+                plan.group_writes[(date, group)] = schedule_data[date][group]
+    for date, groups in old_groups.items():
+        for group in groups:
+            if group not in group_hashes.get(date, {}):
+                plan.group_deletes.append((date, group))
+
+    for teacher, bucket in teacher_hashes.items():
+        if old_teachers.get(teacher) != bucket:
+            plan.teacher_writes[teacher] = projections[teacher]
+    plan.teacher_deletes = [teacher for teacher in old_teachers if teacher not in teacher_hashes]
+
+    plan.manifest = {
+        'groups': group_hashes,
+        'teachers': teacher_hashes,
+        'version': content_hash([group_hashes, teacher_hashes])
+    }
+    return plan
@@ -0,0 +1,130 @@
+import time
+import zlib
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import msgpack
+from bot.utils.schedule_hash import content_hash
+
+# Снимок расписания в одном документе: каждая дата упакована в msgpack
+# и сжата zlib отдельно, чтобы читать только нужные дни
+SNAPSHOT_FORMAT = 'msgpack+zlib'
+SNAPSHOT_VERSION = 1
+COMPRESSION_LEVEL = 6
+
+
+class SnapshotError(Exception):
+    """Снимок неизвестного формата или поврежден"""
+
+
+@dataclass
+class SnapshotStats:
+    """Размеры и время кодирования снимка"""
+    dates: int = 0
+    raw_size: int = 0  # байт msgpack до сжатия
+    size: int = 0  # байт после сжатия
+    encode_ms: float = 0.0
+    decode_ms: float = 0.0
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_size / self.size if self.size else 0.0
+
+
+def encode_day(groups: Dict[str, List[Dict]], level: int = COMPRESSION_LEVEL) -> Tuple[bytes, int]:
+    """Упаковка одного дня {группа: [пары]}: (сжатые байты, размер до сжатия)"""
+    packed = msgpack.packb(groups, use_bin_type=True)
+    return zlib.compress(packed, level), len(packed)
+
+
+def decode_day(blob: bytes) -> Dict[str, List[Dict]]:
+    return msgpack.unpackb(zlib.decompress(blob), raw=False)
+
+
+def encode_snapshot(schedule_data: Dict[str, Dict[str, List[Dict]]],
+                    level: int = COMPRESSION_LEVEL) -> Tuple[Dict[str, Any], SnapshotStats]:
+    """Документ снимка для хранения и статистика кодирования
+
+    Даты хранятся списком, поэтому их порядок сохраняется
+    (ключи словаря Firestore возвращает отсортированными).
+    """
+    start = time.perf_counter()
+    days, raw_size, size = [], 0, 0
+    for date, groups in schedule_data.items():
+        blob, packed_size = encode_day(groups, level)
+        days.append({'date': date, 'data': blob})
+        raw_size += packed_size
+        size += len(blob)
+    document = {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'hash': content_hash(schedule_data),
+        'days': days,
+        'raw_size': raw_size,
+        'size': size
+    }
+    stats = SnapshotStats(len(days), raw_size, size, (time.perf_counter() - start) * 1000)
+    return document, stats
+
+
+def is_snapshot(document: Optional[Dict[str, Any]]) -> bool:
+    """Документ записан в формате снимка, а не вложенным словарем"""
+    return bool(document) and document.get('format') == SNAPSHOT_FORMAT
+
+
+class LazySchedule(Mapping):
+    """Расписание из снимка: {дата: {группа: [пары]}} с распаковкой дня при первом обращении
+
+    Ведет себя как словарь только для чтения, поэтому потребители
+    get_schedule() работают с ним так же, как с вложенным словарем.
+    """
+
+    def __init__(self, document: Dict[str, Any]):
+        if not is_snapshot(document):
+            raise SnapshotError(f"Неизвестный формат снимка: {document.get('format') if document else None}")
+        if document.get('version') != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Неподдерживаемая версия снимка: {document.get('version')}")
+        self.hash = document.get('hash')
+        self.size = document.get('size', 0)
+        self._blobs: Dict[str, bytes] = {day['date']: day['data'] for day in document.get('days', [])}
+        self._days: Dict[str, Dict[str, List[Dict]]] = {}
+        self.decode_ms = 0.0
+
+    def __getitem__(self, date: str) -> Dict[str, List[Dict]]:
+        day = self._days.get(date)
+        if day is None:
+            blob = self._blobs[date]
+            start = time.perf_counter()
+            try:
+                day = decode_day(blob)
+            except (zlib.error, ValueError, msgpack.UnpackException) as e:
+                raise SnapshotError(f"Не удалось распаковать день {date}: {e}") from e
+            self.decode_ms += (time.perf_counter() - start) * 1000
+            self._days[date] = day
+        return day
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._blobs)
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    @property
+    def decoded(self) -> int:
+        """Сколько дней уже распаковано"""
+        return len(self._days)
+
+    def to_dict(self) -> Dict[str, Dict[str, List[Dict]]]:
+        """Полностью распакованное расписание"""
+        return {date: self[date] for date in self}
+
+    def verify(self) -> bool:
+        """Совпадает ли хэш распакованного расписания с записанным"""
+        return content_hash(self.to_dict()) == self.hash
+
+
+def load_schedule(document: Optional[Dict[str, Any]]) -> Optional[Mapping]:
+    """Расписание из документа schedule/current в любом из форматов хранения"""
+    if is_snapshot(document):
+        return LazySchedule(document)
+    return document
@@ -0,0 +1,169 @@
+from io import BytesIO
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+from bs4 import BeautifulSoup
+from lxml import etree
+
+# Порядок колонок таблицы ARI Data Tables (ari-tbl-col-N)
+COL_DATE = 0
+COL_GROUP = 1
+COL_NUMBER = 2
+COL_DISCIPLINE = 3
+COL_TEACHER = 4
+COL_CLASSROOM = 5
+COL_SUBGROUP = 6
+
+_CELL_TAGS = ('td', 'th')
+
+
+def _cell_text(cell) -> str:
+    """Текст ячейки, аналог BeautifulSoup get_text(strip=True)"""
+    return ''.join(part.strip() for part in cell.itertext())
+
+
+def _cell_value(cell) -> Optional[str]:
+    """Текст ячейки td; None, если ячейка не td (как row.find('td', ...) в прежнем коде)"""
+    if cell.tag != 'td':
+        return None
+    return _cell_text(cell)
+
+
+def _make_lesson(number: Optional[str], discipline: Optional[str], teacher: Optional[str],
+                 classroom: Optional[str], subgroup: Optional[str]) -> Optional[Dict]:
+    """Запись о паре из текстов ячеек (None - ячейки нет)"""
+    if number is None and discipline is None and teacher is None and classroom is None:
+        return None
+    return {
+        'number': int(number) if number and number.isdigit() else 0,
+        'discipline': discipline or '',
+        'teacher': teacher or '',
+        'classroom': classroom or '',
+        'subgroup': subgroup if subgroup is not None else '0',
+        'group': ''
+    }
+
+
+def iter_lessons(html: str | bytes) -> Iterator[Tuple[str, Optional[str], Optional[Dict]]]:
+    """Потоковый разбор строк таблиц расписания
+
+    Читает только элементы <tr>, ячейки берет по номеру колонки за один
+    проход и сразу освобождает разобранные строки. Для каждой строки с
+    непустой первой ячейкой возвращает (дата, группа, пара); группа и
+    пара равны None, если в строке нет ячейки группы (например, заголовок).
+    """
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+
+    for _, row in etree.iterparse(BytesIO(html), events=('end',), tag='tr',
+                                  html=True, encoding='utf-8', recover=True):
+        try:
+            cells = [cell for cell in row.iter(*_CELL_TAGS)]
+            if not cells:
+                continue
+
+            date = _cell_text(cells[0])
+            if not date:
+                continue
+            date = date.strip('()')
+
+            texts = [_cell_value(cell) for cell in cells]
+            texts.extend([None] * (COL_SUBGROUP + 1 - len(texts)))
+
+            group = texts[COL_GROUP]
+            if group is None:
+                yield date, None, None
+                continue
+
+            try:
+                lesson = _make_lesson(
+                    texts[COL_NUMBER], texts[COL_DISCIPLINE], texts[COL_TEACHER],
+                    texts[COL_CLASSROOM], texts[COL_SUBGROUP]
+                )
+            except ValueError:
+                lesson = None
+            yield date, group, lesson
+        finally:
+            # Освобождаем память под уже обработанные строки
+            row.clear()
+            while row.getprevious() is not None:
+                del row.getparent()[0]
+
+
+def collect_schedule(html: str | bytes, schedule_data: Dict, group_set: Set[str],
+                     teacher_set: Set[str]) -> int:
+    """Добавление пар со страницы в расписание, возвращает число строк"""
+    return assemble_schedule(iter_lessons(html), schedule_data, group_set, teacher_set)
+
+
+def assemble_schedule(records: Iterable[Tuple[str, Optional[str], Optional[Dict]]], schedule_data: Dict,
+                      group_set: Set[str], teacher_set: Set[str]) -> int:
+    """Сборка расписания {дата: {группа: [пары]}} из записей iter_lessons"""
+    rows = 0
+    for date, group, lesson in records:
+        rows += 1
+        day = schedule_data.setdefault(date, {})
+        if group is None:
+            continue
+        group_set.add(group)
+        if lesson:
+            day.setdefault(group, []).append(lesson)
+            if lesson['teacher']:
+                teacher_set.add(lesson['teacher'])
+    return rows
+
+
+def extract_lesson_data_soup(row) -> Optional[Dict]:
+    """Извлечение данных о паре из строки BeautifulSoup (прежняя реализация)"""
+    number = row.find('td', class_='ari-tbl-col-2')
+    discipline = row.find('td', class_='ari-tbl-col-3')
+    teacher = row.find('td', class_='ari-tbl-col-4')
+    classroom = row.find('td', class_='ari-tbl-col-5')
+    subgroup = row.find('td', class_='ari-tbl-col-6')
+
+    if any([number, discipline, teacher, classroom]):
+        return {
+            'number': int(number.get_text(strip=True)) if number and number.get_text(strip=True).isdigit() else 0,
+            'discipline': discipline.get_text(strip=True) if discipline else '',
+            'teacher': teacher.get_text(strip=True) if teacher else '',
+            'classroom': classroom.get_text(strip=True) if classroom else '',
+            'subgroup': subgroup.get_text(strip=True) if subgroup else '0',
+            'group': ''  # Добавляем пустое поле для группы
+        }
+    return None
+
+
+def collect_schedule_soup(html: str, schedule_data: Dict, group_set: Set[str],
+                          teacher_set: Set[str]) -> bool:
+    """Разбор страницы через BeautifulSoup (прежняя реализация, для сверки и бенчмарков)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    schedule_tables = soup.find_all('table')
+
+    if not schedule_tables:
+        return False
+
+    for table in schedule_tables:
+        for row in table.find_all('tr'):
+            cells = row.find_all(['td', 'th'])
+            if not cells:
+                continue
+
+            date_cell = cells[0].get_text(strip=True)
+            if len(date_cell) > 0:
+                try:
+                    current_day = date_cell.strip('()')
+                    if current_day not in schedule_data:
+                        schedule_data[current_day] = {}
+
+                    group_cell = row.find('td', class_='ari-tbl-col-1')
+                    if group_cell:
+                        group = group_cell.get_text(strip=True)
+                        group_set.add(group)
+
+                        lesson_data = extract_lesson_data_soup(row)
+                        if lesson_data:
+                            schedule_data[current_day].setdefault(group, []).append(lesson_data)
+                            if lesson_data['teacher']:
+                                teacher_set.add(lesson_data['teacher'])
+                except ValueError:
+                    continue
+
+    return True
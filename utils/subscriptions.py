@@ -0,0 +1,61 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bot.utils.schedule_shards import shard_id
+from bot.utils.user_stats import STUDENT_ROLE
+
+GROUP = 'group'
+TEACHER = 'teacher'
+
+# Цель подписки: (GROUP, 'ИС-21') или (TEACHER, 'Иванов И.И.')
+SubscriptionKey = Tuple[str, str]
+
+
+def subscription_key(profile: Optional[Dict[str, Any]]) -> Optional[SubscriptionKey]:
+    """На какую группу или преподавателя подписан пользователь (None - ни на что)
+
+    Как и в рассылке, студент получает расписание своей группы,
+    остальные роли - выбранного преподавателя.
+    """
+    if not profile or not profile.get('notifications'):
+        return None
+    if profile.get('role') == STUDENT_ROLE:
+        group = profile.get('selected_group')
+        return (GROUP, group) if group else None
+    teacher = profile.get('selected_teacher')
+    return (TEACHER, teacher) if teacher else None
+
+
+def subscription_document_id(key: SubscriptionKey) -> str:
+    """Идентификатор документа индекса для цели подписки"""
+    return shard_id(*key)
+
+
+def subscription_changes(user_id: int, old: Optional[Dict[str, Any]],
+                         new: Optional[Dict[str, Any]]) -> Dict[SubscriptionKey, Dict[int, bool]]:
+    """Изменения индекса при переходе профиля из old в new: цель -> {user_id: добавить/удалить}"""
+    old_key = subscription_key(old)
+    new_key = subscription_key(new)
+    if old_key == new_key:
+        return {}
+    changes: Dict[SubscriptionKey, Dict[int, bool]] = {}
+    if old_key:
+        changes[old_key] = {user_id: False}
+    if new_key:
+        changes[new_key] = {user_id: True}
+    return changes
+
+
+def merge_subscription_changes(target: Dict[SubscriptionKey, Dict[int, bool]],
+                               changes: Dict[SubscriptionKey, Dict[int, bool]]):
+    """Сложение изменений индекса (более позднее изменение пользователя побеждает)"""
+    for key, users in changes.items():
+        target.setdefault(key, {}).update(users)
+
+
+def build_subscriptions(users: Iterable[Tuple[int, Dict[str, Any]]]) -> Dict[SubscriptionKey, List[int]]:
+    """Индекс, построенный заново по всем пользователям (user_id, профиль)"""
+    index: Dict[SubscriptionKey, List[int]] = {}
+    for user_id, profile in users:
+        key = subscription_key(profile)
+        if key:
+            index.setdefault(key, []).append(user_id)
+    return index
@@ -0,0 +1,64 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+STUDENT_ROLE = 'Студент'
+
+# Счетчик - путь в документе агрегатов: ('total',), ('roles', 'Студент'), ('groups', 'ИС-21')
+CounterKey = Tuple[str, ...]
+
+
+def profile_counters(profile: Optional[Dict[str, Any]]) -> Counter:
+    """Вклад одного пользователя в агрегаты"""
+    counters = Counter()
+    if not profile:
+        return counters
+    counters[('total',)] += 1
+    if profile.get('notifications'):
+        counters[('notifications',)] += 1
+    role = profile.get('role')
+    if role:
+        counters[('roles', role)] += 1
+    # Распределение по группам считается только для студентов, как в админ-панели
+    group = profile.get('selected_group')
+    if role == STUDENT_ROLE and group:
+        counters[('groups', group)] += 1
+    return counters
+
+
+def counter_delta(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[CounterKey, int]:
+    """Изменение агрегатов при переходе профиля из old в new (нулевые изменения не включаются)"""
+    delta = dict(profile_counters(new))
+    for key, value in profile_counters(old).items():
+        delta[key] = delta.get(key, 0) - value
+    return {key: value for key, value in delta.items() if value}
+
+
+def merge_deltas(target: Dict[CounterKey, int], delta: Dict[CounterKey, int]):
+    """Сложение изменений агрегатов"""
+    for key, value in delta.items():
+        target[key] = target.get(key, 0) + value
+        if not target[key]:
+            del target[key]
+
+
+def aggregate_users(users: Iterable[Dict[str, Any]]) -> Dict[CounterKey, int]:
+    """Агрегаты, пересчитанные по всем пользователям"""
+    totals = Counter()
+    for user in users:
+        totals.update(profile_counters(user))
+    return dict(totals)
+
+
+def nest_counters(counters: Dict[CounterKey, Any]) -> Dict[str, Any]:
+    """Плоские счетчики в структуру документа {'total': n, 'roles': {...}, ...}"""
+    document: Dict[str, Any] = {}
+    for key, value in counters.items():
+        node = document
+        for part in key[:-1]:
+            node = node.setdefault(part, {})
+        node[key[-1]] = value
+    return document
+
+
+def empty_stats() -> Dict[str, Any]:
+    return {'total': 0, 'notifications': 0, 'roles': {}, 'groups': {}}